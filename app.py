@@ -3,148 +3,35 @@ DUODRIVEN - Full-Stack Growth Engineering
 Flask Application Entry Point
 """
 
-from flask import Flask, render_template, request, jsonify, redirect, send_from_directory
+from flask import Flask, render_template, request, jsonify, redirect, send_from_directory, Response, stream_with_context, abort
 from flask_compress import Compress
-import requests
+import json
 import os
 import uuid
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 from datetime import datetime
 from dotenv import load_dotenv
 from config import config
+from services.chat import chat_proxy, ChatBusy, parse_reply, reply_text
+from services.chat_cache import chat_cache
+from services.rate_limit import rate_limiter
 
 load_dotenv()
 
 # Initialize Flask-Compress
 compress = Compress()
 
-def send_contact_email(contact_data):
-    """Send email notification for new contact form submission"""
-    try:
-        # Email configuration
-        smtp_server = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
-        smtp_port = int(os.getenv('SMTP_PORT', 587))
-        smtp_username = os.getenv('SMTP_USERNAME', '')
-        smtp_password = os.getenv('SMTP_PASSWORD', '')
-        recipient_email = 'morissonlarry40@gmail.com'
-        
-        if not smtp_username or not smtp_password:
-            print("SMTP credentials not configured")
-            return False
-        
-        # Create email message
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = f"🚀 New Lead: {contact_data.get('name', 'Unknown')} - {contact_data.get('company', 'N/A')}"
-        msg['From'] = smtp_username
-        msg['To'] = recipient_email
-        
-        # Plain text version
-        text_content = f"""
-New Contact Form Submission
-
-Name: {contact_data.get('name', 'N/A')}
-Email: {contact_data.get('email', 'N/A')}
-Company: {contact_data.get('company', 'N/A')}
-Phone: {contact_data.get('phone', 'N/A')}
-Role: {contact_data.get('role', 'N/A')}
-Budget: {contact_data.get('budget', 'N/A')}
-Services: {', '.join(contact_data.get('services', [])) if isinstance(contact_data.get('services'), list) else contact_data.get('services', 'N/A')}
-Timeline: {contact_data.get('timeline', 'N/A')}
-
-Message:
-{contact_data.get('message', 'No message provided')}
-
-Submitted: {contact_data.get('timestamp', datetime.utcnow().isoformat())}
-        """
-        
-        # HTML version
-        html_content = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; background: #f5f5f5; padding: 20px;">
-            <div style="background: linear-gradient(135deg, #0a0e1a 0%, #1a1f35 100%); padding: 30px; border-radius: 12px;">
-                <h1 style="color: #00d9ff; margin: 0 0 10px 0;">🚀 New Lead Received!</h1>
-                <p style="color: #a0a0b0; margin: 0;">Someone is interested in DUODRIVEN services</p>
-            </div>
-            
-            <div style="background: white; padding: 30px; border-radius: 12px; margin-top: 20px; box-shadow: 0 2px 10px rgba(0,0,0,0.1);">
-                <h2 style="color: #0a0e1a; border-bottom: 2px solid #00d9ff; padding-bottom: 10px;">Contact Details</h2>
-                
-                <table style="width: 100%; border-collapse: collapse;">
-                    <tr>
-                        <td style="padding: 10px 0; color: #666; width: 120px;"><strong>Name:</strong></td>
-                        <td style="padding: 10px 0; color: #0a0e1a;">{contact_data.get('name', 'N/A')}</td>
-                    </tr>
-                    <tr>
-                        <td style="padding: 10px 0; color: #666;"><strong>Email:</strong></td>
-                        <td style="padding: 10px 0;"><a href="mailto:{contact_data.get('email', '')}" style="color: #00d9ff;">{contact_data.get('email', 'N/A')}</a></td>
-                    </tr>
-                    <tr>
-                        <td style="padding: 10px 0; color: #666;"><strong>Company:</strong></td>
-                        <td style="padding: 10px 0; color: #0a0e1a;">{contact_data.get('company', 'N/A')}</td>
-                    </tr>
-                    <tr>
-                        <td style="padding: 10px 0; color: #666;"><strong>Phone:</strong></td>
-                        <td style="padding: 10px 0;"><a href="tel:{contact_data.get('phone', '')}" style="color: #00d9ff;">{contact_data.get('phone', 'N/A')}</a></td>
-                    </tr>
-                    <tr>
-                        <td style="padding: 10px 0; color: #666;"><strong>Role:</strong></td>
-                        <td style="padding: 10px 0; color: #0a0e1a;">{contact_data.get('role', 'N/A')}</td>
-                    </tr>
-                    <tr>
-                        <td style="padding: 10px 0; color: #666;"><strong>Budget:</strong></td>
-                        <td style="padding: 10px 0; color: #0a0e1a;">{contact_data.get('budget', 'N/A')}</td>
-                    </tr>
-                    <tr>
-                        <td style="padding: 10px 0; color: #666;"><strong>Services:</strong></td>
-                        <td style="padding: 10px 0; color: #0a0e1a;">{', '.join(contact_data.get('services', [])) if isinstance(contact_data.get('services'), list) else contact_data.get('services', 'N/A')}</td>
-                    </tr>
-                    <tr>
-                        <td style="padding: 10px 0; color: #666;"><strong>Timeline:</strong></td>
-                        <td style="padding: 10px 0; color: #0a0e1a;">{contact_data.get('timeline', 'N/A')}</td>
-                    </tr>
-                </table>
-                
-                <h3 style="color: #0a0e1a; margin-top: 20px;">Message:</h3>
-                <div style="background: #f8f9fa; padding: 15px; border-radius: 8px; border-left: 4px solid #00d9ff;">
-                    <p style="margin: 0; color: #333; line-height: 1.6;">{contact_data.get('message', 'No message provided')}</p>
-                </div>
-                
-                <div style="margin-top: 30px; padding-top: 20px; border-top: 1px solid #eee;">
-                    <p style="color: #999; font-size: 12px; margin: 0;">
-                        Submitted: {contact_data.get('timestamp', datetime.utcnow().isoformat())}
-                    </p>
-                </div>
-            </div>
-            
-            <div style="text-align: center; margin-top: 20px;">
-                <a href="mailto:{contact_data.get('email', '')}" style="display: inline-block; background: linear-gradient(135deg, #00d9ff, #7c3aed); color: white; padding: 12px 30px; border-radius: 8px; text-decoration: none; font-weight: bold;">Reply to Lead</a>
-            </div>
-        </body>
-        </html>
-        """
-        
-        msg.attach(MIMEText(text_content, 'plain'))
-        msg.attach(MIMEText(html_content, 'html'))
-        
-        # Send email
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()
-            server.login(smtp_username, smtp_password)
-            server.sendmail(smtp_username, recipient_email, msg.as_string())
-        
-        print(f"Email sent successfully to {recipient_email}")
-        return True
-        
-    except Exception as e:
-        print(f"Failed to send email: {e}")
-        return False
+# Subdomain landing pages: <label>.<domain>/ serves the template. Other
+# paths on a subdomain fall through to the normal routes.
+SUBDOMAIN_PAGES = {
+    'marketing': 'pillars/marketing.html',
+    'automation': 'pillars/automation.html',
+    'ai': 'pillars/ai.html',
+}
 
-def create_app(config_name='default'):
-    """Application factory"""
+def create_app(config_name=None):
+    """Application factory (config from FLASK_ENV unless named)"""
     app = Flask(__name__)
-    app.config.from_object(config[config_name])
+    app.config.from_object(config[config_name or os.getenv('FLASK_ENV', 'default')])
     
     # ============================================
     # PERFORMANCE OPTIMIZATIONS
@@ -158,7 +45,10 @@ def create_app(config_name='default'):
     ]
     app.config['COMPRESS_LEVEL'] = 6
     app.config['COMPRESS_MIN_SIZE'] = 500
-    app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip', 'deflate']
+    # No deflate: every client that accepts deflate accepts gzip, and static
+    # files are served from build-time .br/.gz siblings (services.assets)
+    app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+    app.config['COMPRESS_ALGORITHM_STREAMING'] = ['br']
     compress.init_app(app)
     
     # Static file caching headers
@@ -176,9 +66,51 @@ def create_app(config_name='default'):
     from models import db
     db.init_app(app)
     
-    # Create tables
+    # Request, query and upstream metrics on /metrics
+    from services.metrics import metrics
+    metrics.init_app(app)
+    
+    # Create tables and apply pending migrations
+    from migrations import migrate
     with app.app_context():
-        db.create_all()
+        migrate()
+    
+    # Fingerprinted CSS/JS bundles (asset_urls() in templates)
+    from services.assets import assets
+    assets.init_app(app)
+    
+    # Opt-in HTML minification (HTML_MINIFY=true)
+    from services.html_minify import html_minifier
+    html_minifier.init_app(app)
+    
+    # Pre-rendered, pre-compressed marketing pages
+    from services.page_cache import page_cache
+    page_cache.init_app(app)
+    
+    # Cached sitemap and RSS feeds
+    from services.feeds import feed_cache
+    feed_cache.init_app(app)
+    
+    # Pooled, streaming n8n chat proxy
+    chat_proxy.init_app(app)
+    
+    # Opt-in cache of replies to common opening questions
+    chat_cache.init_app(app)
+    
+    # Per-client and global limits on the public POST endpoints
+    rate_limiter.init_app(app)
+    
+    # Background email/webhook delivery
+    from services.delivery import delivery_queue
+    delivery_queue.init_app(app)
+    
+    # Buffered blog view counts
+    from services.view_counter import view_counter
+    view_counter.init_app(app)
+    
+    # CLI commands (flask --app app render-posts, ...)
+    from commands import register_commands
+    register_commands(app)
     
     # ============================================
     # CACHING MIDDLEWARE
@@ -188,8 +120,11 @@ def create_app(config_name='default'):
     def add_cache_headers(response):
         """Add caching headers for static assets"""
         if request.path.startswith('/static/'):
-            # Cache static files for 1 year (they have versioned URLs)
-            response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+            if request.path.startswith('/static/dist/') or request.args.get('v'):
+                # Fingerprinted URLs (see services.assets) never change
+                response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+            else:
+                response.headers['Cache-Control'] = 'public, max-age=86400'
             response.headers['Vary'] = 'Accept-Encoding'
         elif request.path.endswith(('.html', '/')):
             # HTML pages - cache for 1 hour, revalidate
@@ -240,145 +175,163 @@ def create_app(config_name='default'):
         """Serve favicon from root"""
         return app.send_static_file('images/favicon.ico')
     
+    @app.route('/sitemap.xml')
+    def sitemap():
+        """Site-wide sitemap, or a sitemap index once it outgrows one file"""
+        return feed_cache.sitemap()
+    
+    @app.route('/sitemap-<int:shard>.xml')
+    def sitemap_shard(shard):
+        """One shard of a sitemap index"""
+        response = feed_cache.sitemap(shard)
+        if response is None:
+            abort(404)
+        return response
+    
     @app.route('/')
     def index():
-        """Homepage - Main landing page"""
-        return render_template('index.html')
+        """Homepage - Main landing page, or a pillar page on its subdomain"""
+        label, dot, _ = request.host.lower().partition('.')
+        template = SUBDOMAIN_PAGES.get(label) if dot else None
+        return page_cache.render(template or 'index.html')
     
     @app.route('/services')
     def services():
         """Services page - detailed service information"""
-        return render_template('services.html')
+        return page_cache.render('services.html')
     
     @app.route('/case-studies')
     def case_studies():
         """Case studies page"""
-        return render_template('case-studies.html')
+        return page_cache.render('case-studies.html')
     
     @app.route('/technology')
     def technology():
         """Technology stack page"""
-        return render_template('technology.html')
+        return page_cache.render('technology.html')
     
     @app.route('/about')
     def about():
         """About page"""
-        return render_template('about.html')
+        return page_cache.render('about.html')
     
     @app.route('/contact')
     def contact():
         """Contact page"""
-        return render_template('contact.html')
+        return page_cache.render('contact.html')
     
     @app.route('/pricing')
     def pricing():
         """Pricing page"""
-        return render_template('pricing.html')
+        return page_cache.render('pricing.html')
 
     @app.route('/privacy')
     @app.route('/privacy-policy')
     def privacy():
         """Privacy Policy page"""
-        return render_template('privacy.html')
+        return page_cache.render('privacy.html')
 
     @app.route('/terms')
     @app.route('/terms-of-service')
     def terms():
         """Terms of Service page"""
-        return render_template('terms.html')
+        return page_cache.render('terms.html')
 
     # Note: /blog route is now handled by blog_bp blueprint
 
     @app.route('/pillar/marketing')
     def pillar_marketing():
         """Digital Marketing pillar landing page"""
-        return render_template('pillars/marketing.html')
+        return page_cache.render('pillars/marketing.html')
     
     @app.route('/pillar/automation')
     def pillar_automation():
         """Marketing Automation pillar landing page"""
-        return render_template('pillars/automation.html')
+        return page_cache.render('pillars/automation.html')
     
     @app.route('/pillar/ai')
     def pillar_ai():
         """AI Engineering pillar landing page"""
-        return render_template('pillars/ai.html')
+        return page_cache.render('pillars/ai.html')
     
-    # ============================================
-    # SUBDOMAIN ROUTING MIDDLEWARE
-    # ============================================
-    
-    @app.before_request
-    def handle_subdomains():
-        """Route requests based on subdomain"""
-        host = request.host.lower()
-        
-        # Handle subdomain routing
-        if host.startswith('marketing.'):
-            if request.path == '/' or request.path == '':
-                return render_template('pillars/marketing.html')
-        elif host.startswith('automation.'):
-            if request.path == '/' or request.path == '':
-                return render_template('pillars/automation.html')
-        elif host.startswith('ai.'):
-            if request.path == '/' or request.path == '':
-                return render_template('pillars/ai.html')
-        
-        # Continue with normal routing
-        return None
-
     # ============================================
     # API ENDPOINTS
     # ============================================
     
     @app.route('/api/chat', methods=['POST'])
+    @rate_limiter.limit('chat', reply="You're sending messages faster than I can answer. Please wait a moment.")
     def chat():
         """
         Proxy endpoint for n8n webhook to handle AI chat.
         Avoids CORS issues by routing through backend.
+        
+        Clients that accept application/x-ndjson get the reply streamed as
+        it arrives, one {"type": "delta", "content": "..."} line per chunk
+        followed by {"type": "done"}. Others get a single JSON response.
+        
+        With CHAT_CACHE_ENABLED, a session's opening question may be
+        answered from services.chat_cache (X-Chat-Cache: hit).
         """
-        data = request.json
-        webhook_url = app.config.get('N8N_WEBHOOK_URL')
+        from requests.exceptions import Timeout, RequestException
+        
+        data = request.get_json(silent=True) or {}
         
-        if not webhook_url:
+        if not chat_proxy.webhook_url:
             return jsonify({
                 'error': 'Chat service not configured',
                 'reply': "I'm currently unavailable. Please email us at hello@duodriven.com"
             }), 503
         
+        streaming = request.accept_mimetypes.quality('application/x-ndjson') > request.accept_mimetypes.quality('application/json')
+        try:
+            chat_proxy.acquire()
+        except ChatBusy:
+            return jsonify({
+                'error': 'busy',
+                'reply': "I'm helping a lot of people right now. Please try again in a moment."
+            }), 503, {'Retry-After': '5'}
+        
+        # Only a request that got a slot counts as a hit, miss or seen session
         try:
-            response = requests.post(
-                webhook_url,
-                json={
-                    'chatInput': data.get('message', ''),
-                    'sessionId': data.get('session_id', str(uuid.uuid4()))
-                },
-                timeout=60,
-                headers={'Content-Type': 'application/json'}
+            question, cached = chat_cache.lookup(data.get('message'), data.get('session_id'))
+        except Exception:
+            chat_proxy.release()
+            raise
+        if cached is not None:
+            chat_proxy.release()
+            headers = {'Cache-Control': 'no-cache', 'X-Chat-Cache': 'hit'}
+            if streaming:
+                body = json.dumps({'type': 'delta', 'content': cached}) + '\n' + json.dumps({'type': 'done'}) + '\n'
+                return Response(body, mimetype='application/x-ndjson', headers=headers)
+            return jsonify({'response': cached}), 200, headers
+        
+        payload = {
+            'chatInput': data.get('message', ''),
+            'sessionId': data.get('session_id', str(uuid.uuid4()))
+        }
+        
+        if streaming:
+            response = Response(
+                stream_with_context(stream_chat(payload, question)),
+                mimetype='application/x-ndjson',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
             )
-            
-            # Log response for debugging
-            print(f"Webhook Status: {response.status_code}")
-            print(f"Webhook Response: {response.text[:500] if response.text else 'Empty'}")
-            
-            # Try to parse JSON response
-            try:
-                result = response.json()
-                # Handle array response (n8n sometimes returns array)
-                if isinstance(result, list) and len(result) > 0:
-                    result = result[0]
-                return jsonify(result)
-            except Exception as e:
-                print(f"JSON Parse Error: {e}")
-                # If response isn't JSON, wrap it
-                return jsonify({'response': response.text})
-                
-        except requests.exceptions.Timeout:
+            # Runs when the server closes the stream, even if it never started
+            response.call_on_close(chat_proxy.release)
+            return response
+        
+        try:
+            response = chat_proxy.post(payload)
+            result = parse_reply(response.text)
+            if response.ok:
+                chat_cache.store(question, reply_text(result))
+            return jsonify(result)
+        except Timeout:
             return jsonify({
                 'error': 'timeout',
                 'reply': "I'm taking longer than expected. Please try again in a moment."
             }), 504
-        except requests.exceptions.RequestException as e:
+        except RequestException as e:
             return jsonify({
                 'error': str(e),
                 'reply': "I encountered a connection issue. Please try again."
@@ -388,12 +341,42 @@ def create_app(config_name='default'):
                 'error': str(e),
                 'reply': "Sorry, I encountered an error. Please try again or email us at hello@duodriven.com"
             }), 500
+        finally:
+            chat_proxy.release()
+    
+    def stream_chat(payload, question=None):
+        """Relay the upstream reply as NDJSON lines, caching it under question"""
+        from requests.exceptions import Timeout
+        
+        try:
+            chunks = []
+            with chat_proxy.post(payload, stream=True) as response:
+                for chunk in chat_proxy.iter_reply(response):
+                    chunks.append(chunk)
+                    yield json.dumps({'type': 'delta', 'content': chunk}) + '\n'
+            if response.ok:
+                chat_cache.store(question, ''.join(chunks))
+            yield json.dumps({'type': 'done'}) + '\n'
+        except Timeout:
+            yield json.dumps({
+                'type': 'error',
+                'error': 'timeout',
+                'reply': "I'm taking longer than expected. Please try again in a moment."
+            }) + '\n'
+        except Exception as e:
+            yield json.dumps({
+                'type': 'error',
+                'error': str(e),
+                'reply': "I encountered a connection issue. Please try again."
+            }) + '\n'
     
     @app.route('/api/contact', methods=['POST'])
+    @rate_limiter.limit('contact', 'Too many submissions. Please try again later or email us at hello@duodriven.com')
     def submit_contact():
         """
         Handle contact form submissions.
-        Sends email notification and can forward to n8n webhook.
+        Stores the submission and queues the email notification and
+        n8n webhook for background delivery.
         """
         data = request.json
         
@@ -432,20 +415,47 @@ def create_app(config_name='default'):
             'source': 'website_contact_form'
         }
         
-        # Send email notification
-        send_contact_email(contact_data)
+        # Save the lead, then queue the email and webhook for background
+        # delivery so the response never waits on SMTP or the webhook
+        from models import db, ContactSubmission
+        try:
+            submission = ContactSubmission(
+                name=contact_data['name'],
+                email=contact_data['email'],
+                company=contact_data['company'],
+                phone=contact_data['phone'],
+                message=contact_data['message'],
+                service_interest=contact_data['service_interest'] or None,
+                budget_range=contact_data['budget_range'] or contact_data['budget'] or None,
+                source='website',
+                utm_source=data.get('utm_source'),
+                utm_medium=data.get('utm_medium'),
+                utm_campaign=data.get('utm_campaign')
+            )
+            db.session.add(submission)
+            db.session.flush()
+            
+            # Without SMTP credentials the job could only fail its retries
+            if delivery_queue.mailer.configured:
+                delivery_queue.enqueue('email', {
+                    'recipient': app.config['CONTACT_RECIPIENT'],
+                    'contact': contact_data
+                }, contact_id=submission.id)
+            if webhook_url:
+                delivery_queue.enqueue('webhook', {
+                    'url': webhook_url,
+                    'data': contact_data
+                }, contact_id=submission.id)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Failed to save contact submission: {e}")
+            return jsonify({
+                'success': False,
+                'error': 'Something went wrong. Please email us at hello@duodriven.com'
+            }), 500
         
-        if webhook_url:
-            try:
-                response = requests.post(
-                    webhook_url,
-                    json=contact_data,
-                    timeout=10
-                )
-                response.raise_for_status()
-            except Exception as e:
-                # Log the error but don't fail - we can still store locally
-                print(f"Webhook error: {e}")
+        delivery_queue.wake()
         
         # Return success
         return jsonify({
@@ -476,8 +486,7 @@ def create_app(config_name='default'):
     
     return app
 
-# Create application instance
-app = create_app(os.getenv('FLASK_ENV', 'development'))
-
+# No module-level app: wsgi.py builds the production one and
+# `flask --app app` finds create_app() itself
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    create_app(os.getenv('FLASK_ENV', 'development')).run(host='0.0.0.0', port=5000, debug=True)
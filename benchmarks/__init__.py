@@ -0,0 +1,7 @@
+"""
+DUODRIVEN Benchmarks
+
+    python -m benchmarks.run                       run and print results
+    python -m benchmarks.run --save-baseline       ... and store them
+    python -m benchmarks.run --compare             ... and diff against the baseline
+"""
@@ -0,0 +1,265 @@
+"""
+Benchmark Runner - Latency and throughput of the hot routes
+
+Builds the app with create_app('testing') against a seeded SQLite
+database (created once per seed size and reused), points the chat proxy
+at a local n8n stub and drives each route in-process through the test
+client, sequentially, after a warm-up. Requests send the browser's
+Accept-Encoding, so compression is included in the timings.
+
+Results are printed as a table and can be saved as a JSON baseline; a
+later run with --compare prints the change against it and, with
+--fail-on-regression, exits non-zero when a route's p50 or p95 got worse
+by more than --threshold.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+HEADERS = {'Accept-Encoding': 'br, gzip', 'Accept': 'text/html,application/json'}
+API_KEY = 'benchmark-api-key'
+# Changes smaller than this are noise whatever the ratio
+MIN_REGRESSION_MS = 0.2
+
+
+def routes(slugs):
+    """(name, method, path or path factory, request kwargs) for each benchmarked route"""
+    slug_cycle = _cycle(slugs)
+    api = {'headers': {**HEADERS, 'X-API-Key': API_KEY}}
+    chat = {'json': {'message': 'How can AI agents help my sales team?', 'session_id': 'bench'}}
+    return [
+        ('home', 'GET', '/', {}),
+        ('blog index', 'GET', '/blog/', {}),
+        ('blog post', 'GET', lambda: f'/blog/{next(slug_cycle)}', {}),
+        ('blog sitemap', 'GET', '/blog/sitemap.xml', {}),
+        ('blog search', 'GET', '/blog/search?q=pipeline+automation', {}),
+        ('api posts', 'GET', '/api/v1/posts?status=published&limit=20', api),
+        ('api chat', 'POST', '/api/chat', chat),
+    ]
+
+
+def _cycle(items):
+    while True:
+        yield from items
+
+
+def percentile(sorted_values, p):
+    """Linear-interpolated percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * p / 100
+    lower = int(k)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (k - lower)
+
+
+def measure(client, method, path, kwargs, count, warmup):
+    """Run one route; returns its summary dict"""
+    kwargs = {'headers': HEADERS, **kwargs}
+    statuses = {}
+
+    def once():
+        target = path() if callable(path) else path
+        start = time.perf_counter()
+        response = client.open(target, method=method, **kwargs)
+        response.get_data()
+        response.close()
+        elapsed = time.perf_counter() - start
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        return elapsed
+
+    for _ in range(warmup):
+        once()
+    statuses.clear()
+
+    timings = []
+    started = time.perf_counter()
+    for _ in range(count):
+        timings.append(once())
+    total = time.perf_counter() - started
+
+    timings.sort()
+    ms = [t * 1000 for t in timings]
+    return {
+        'path': path if isinstance(path, str) else '/blog/<slug>',
+        'method': method,
+        'requests': count,
+        'statuses': {str(code): n for code, n in sorted(statuses.items())},
+        'rps': round(count / total, 1),
+        'mean_ms': round(sum(ms) / len(ms), 3),
+        'p50_ms': round(percentile(ms, 50), 3),
+        'p95_ms': round(percentile(ms, 95), 3),
+        'p99_ms': round(percentile(ms, 99), 3),
+    }
+
+
+def production_like(app):
+    """Undo the testing config's debug-only behaviour that would skew timings"""
+    from config import Config
+    from services.page_cache import page_cache
+    from services.view_counter import view_counter
+
+    app.jinja_env.auto_reload = False
+    page_cache.check_interval = None
+    view_counter.flush_threshold = Config.VIEW_FLUSH_THRESHOLD
+
+
+def build_app(db_path, upstream_url, posts, subscribers, seed_value, reseed):
+    if reseed and os.path.exists(db_path):
+        os.remove(db_path)
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    os.environ['N8N_WEBHOOK_URL'] = upstream_url
+    os.environ['DELIVERY_WORKER_ENABLED'] = 'false'
+    os.environ['DUODRIVEN_API_KEY'] = API_KEY
+    os.environ.pop('PROMETHEUS_MULTIPROC_DIR', None)
+    sys.path.insert(0, ROOT)
+
+    from app import create_app
+    from models import db, BlogPost
+
+    app = create_app('testing')
+    production_like(app)
+    with app.app_context():
+        if BlogPost.query.first() is None:
+            from benchmarks.seed import seed
+            print(f'Seeding {db_path} (one-off) ...')
+            started = time.perf_counter()
+            seed(posts=posts, subscribers=subscribers, seed=seed_value)
+            print(f'  done in {time.perf_counter() - started:.0f}s')
+        slugs = [slug for (slug,) in db.session.query(BlogPost.slug).filter(
+            BlogPost.status == 'published'
+        ).order_by(BlogPost.id).limit(500)]
+        db.session.remove()
+    return app, slugs
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def print_results(results, baseline=None):
+    base = (baseline or {}).get('routes', {})
+    print(f"\n{'route':<14}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}  status")
+    for name, r in results.items():
+        line = f"{name:<14}{r['rps']:>9.1f}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}  "
+        line += ' '.join(f'{code}x{n}' for code, n in r['statuses'].items())
+        if name in base:
+            line += '   vs baseline: ' + ', '.join(
+                f"{key[:3]} {_change(r[key], base[name][key]):+.0%}" for key in ('p50_ms', 'p95_ms')
+            )
+        print(line)
+
+
+def _change(value, reference):
+    return (value - reference) / reference if reference else 0.0
+
+
+def regressions(results, baseline, threshold):
+    """[(route, metric, baseline, current)] that got slower than threshold allows"""
+    found = []
+    for name, r in results.items():
+        reference = baseline.get('routes', {}).get(name)
+        if reference is None:
+            continue
+        for key in ('p50_ms', 'p95_ms'):
+            if r[key] - reference[key] > MIN_REGRESSION_MS and _change(r[key], reference[key]) > threshold:
+                found.append((name, key, reference[key], r[key]))
+    return found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--posts', type=int, default=10000)
+    parser.add_argument('--subscribers', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--requests', type=int, default=300, help='timed requests per route')
+    parser.add_argument('--warmup', type=int, default=20, help='untimed requests per route first')
+    parser.add_argument('--route', action='append', help='only run this route (repeatable)')
+    parser.add_argument('--chat-delay', type=float, default=0.0, help='seconds the n8n stub waits')
+    parser.add_argument('--db', help='SQLite file to seed/reuse (default: per seed size in the temp dir)')
+    parser.add_argument('--reseed', action='store_true', help='rebuild the database first')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--compare', action='store_true')
+    parser.add_argument('--threshold', type=float, default=0.15, help='allowed slowdown, 0.15 = 15%%')
+    parser.add_argument('--fail-on-regression', action='store_true')
+    parser.add_argument('--output', help='also write this run as JSON here')
+    args = parser.parse_args(argv)
+
+    from benchmarks.upstream import StubN8n
+
+    db_path = os.path.abspath(args.db or os.path.join(
+        tempfile.gettempdir(), f'duodriven-bench-{args.posts}-{args.subscribers}-{args.seed}.db'
+    ))
+    stub = StubN8n(delay=args.chat_delay).start()
+    try:
+        app, slugs = build_app(db_path, stub.url, args.posts, args.subscribers, args.seed, args.reseed)
+        client = app.test_client()
+        results = {}
+        for name, method, path, kwargs in routes(slugs):
+            if args.route and name not in args.route:
+                continue
+            results[name] = measure(client, method, path, kwargs, args.requests, args.warmup)
+    finally:
+        stub.stop()
+
+    run = {
+        'created_at': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        'params': {
+            'posts': args.posts, 'subscribers': args.subscribers, 'seed': args.seed,
+            'requests': args.requests, 'warmup': args.warmup, 'chat_delay': args.chat_delay,
+        },
+        'environment': environment(),
+        'routes': results,
+    }
+
+    baseline = None
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            parser.error(f'no baseline at {args.baseline} (run with --save-baseline first)')
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('params', {}).get('posts') != args.posts:
+            print('Warning: baseline was recorded with a different dataset size')
+
+    print_results(results, baseline)
+
+    for path in filter(None, [args.output, args.baseline if args.save_baseline else None]):
+        with open(path, 'w') as f:
+            json.dump(run, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f'\nWrote {path}')
+
+    if baseline is not None:
+        slower = regressions(results, baseline, args.threshold)
+        for name, key, before, after in slower:
+            print(f'REGRESSION {name} {key}: {before:.2f} -> {after:.2f}')
+        if slower and args.fail_on_regression:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
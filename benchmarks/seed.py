@@ -0,0 +1,138 @@
+"""
+Benchmark Seed - Deterministic synthetic blog and newsletter data
+
+Posts get Markdown bodies shaped like the real ones (headings, lists,
+code blocks, tables, links), 2-6 tags from a fixed vocabulary and
+publication dates spread over the last few years; about one in ten is a
+draft or scheduled. Rows are written with executemany and the derived
+data (stored HTML, tag index, post links, search index) is built the way
+the app builds it, so the database looks like a long-running site's.
+"""
+
+import random
+from datetime import datetime, timedelta
+from sqlalchemy import insert
+
+CATEGORIES = ['digital-marketing', 'ai-automation', 'growth-engineering', 'seo', 'ppc', 'case-studies']
+TAGS = [
+    'seo', 'aeo', 'ppc', 'google-ads', 'n8n', 'automation', 'ai-agents', 'voice-ai', 'llm',
+    'analytics', 'cro', 'email', 'crm', 'lead-gen', 'content', 'b2b', 'saas', 'ecommerce',
+    'attribution', 'landing-pages', 'retargeting', 'workflows', 'chatbots', 'python'
+]
+WORDS = (
+    'growth revenue pipeline funnel automation agent workflow campaign conversion audience '
+    'signal model prompt dataset attribution landing query ranking intent keyword budget bid '
+    'retention churn cohort onboarding integration webhook trigger schedule dashboard metric '
+    'experiment variant lift baseline segment persona outreach sequence follow-up qualified '
+    'lead demo proposal contract engineering system infrastructure latency throughput cache'
+).split()
+
+POST_BATCH = 500
+SUBSCRIBER_BATCH = 5000
+
+
+def _sentence(rnd, low=8, high=20):
+    words = rnd.choices(WORDS, k=rnd.randint(low, high))
+    return ' '.join(words).capitalize() + '.'
+
+
+def _paragraph(rnd):
+    return ' '.join(_sentence(rnd) for _ in range(rnd.randint(3, 6)))
+
+
+def markdown_body(rnd):
+    """A 900-1800 word Markdown article"""
+    parts = [_paragraph(rnd)]
+    for section in range(rnd.randint(4, 7)):
+        parts.append(f'## {_sentence(rnd, 3, 6)[:-1]}')
+        for _ in range(rnd.randint(2, 4)):
+            parts.append(_paragraph(rnd))
+        kind = section % 4
+        if kind == 0:
+            parts.append('\n'.join(f'- **{rnd.choice(WORDS)}**: {_sentence(rnd, 5, 10)}' for _ in range(4)))
+        elif kind == 1:
+            parts.append('```python\nfor lead in pipeline:\n    score = model.predict(lead)\n    route(lead, score)\n```')
+        elif kind == 2:
+            rows = '\n'.join(f'| {rnd.choice(WORDS)} | {rnd.randint(1, 99)}% | {rnd.randint(1, 9)}x |' for _ in range(4))
+            parts.append(f'| Channel | Lift | ROI |\n|---|---|---|\n{rows}')
+        else:
+            parts.append(f'### {_sentence(rnd, 2, 4)[:-1]}\n\n> {_sentence(rnd)} [Read more](https://duodriven.com/blog)')
+    return '\n\n'.join(parts)
+
+
+def seed(posts=10000, subscribers=100000, seed=42, log=print):
+    """Fill an empty database; call inside an app context"""
+    from models import db, BlogPost, NewsletterSubscriber
+    from services.posts import default_excerpt
+    from services.post_links import refresh_post_links
+    from services.rendering import render_markdown, RENDER_VERSION
+    from services.tags import rebuild_tag_index
+
+    rnd = random.Random(seed)
+    now = datetime.utcnow().replace(microsecond=0)
+    start = now - timedelta(days=3 * 365)
+
+    rows = []
+    for i in range(posts):
+        title = f'{_sentence(rnd, 4, 9)[:-1]} {i}'
+        content = markdown_body(rnd)
+        html, toc = render_markdown(content)
+        status = rnd.choices(['published', 'draft', 'scheduled'], weights=[90, 6, 4])[0]
+        published_at = start + timedelta(seconds=int((now - start).total_seconds() * i / posts))
+        excerpt = default_excerpt(content)
+        rows.append({
+            'title': title,
+            'slug': f'post-{i}',
+            'content': content,
+            'excerpt': excerpt,
+            'html_content': html,
+            'toc_html': toc,
+            'render_version': RENDER_VERSION,
+            'meta_title': title[:70],
+            'meta_description': excerpt[:160],
+            'category': rnd.choice(CATEGORIES),
+            'tags': rnd.sample(TAGS, rnd.randint(2, 6)),
+            'status': status,
+            'published_at': published_at if status == 'published' else None,
+            'scheduled_for': now + timedelta(days=rnd.randint(1, 30)) if status == 'scheduled' else None,
+            'author': 'DUODRIVEN Team',
+            'read_time': max(1, len(content.split()) // 200),
+            'views': rnd.randint(0, 5000),
+            'created_at': published_at,
+            'updated_at': published_at,
+            'source': 'api',
+            'external_id': f'bench-{i}',
+        })
+        if len(rows) == POST_BATCH:
+            db.session.execute(insert(BlogPost), rows)
+            rows = []
+            log(f'  posts: {i + 1}/{posts}')
+    if rows:
+        db.session.execute(insert(BlogPost), rows)
+
+    rebuild_tag_index()
+    refresh_post_links()
+    db.session.commit()
+
+    rows = []
+    for i in range(subscribers):
+        unsubscribed = rnd.random() < 0.08
+        subscribed_at = start + timedelta(seconds=rnd.randint(0, int((now - start).total_seconds())))
+        rows.append({
+            'email': f'subscriber{i}@example.com',
+            'name': f'Subscriber {i}',
+            'status': 'unsubscribed' if unsubscribed else 'active',
+            'subscribed_at': subscribed_at,
+            'unsubscribed_at': min(now, subscribed_at + timedelta(days=30)) if unsubscribed else None,
+            'source': rnd.choice(['website', 'blog', 'api']),
+        })
+        if len(rows) == SUBSCRIBER_BATCH:
+            db.session.execute(insert(NewsletterSubscriber), rows)
+            rows = []
+    if rows:
+        db.session.execute(insert(NewsletterSubscriber), rows)
+    db.session.commit()
+
+    with db.engine.connect() as conn:
+        conn.exec_driver_sql('ANALYZE')
+    log(f'  seeded {posts} posts and {subscribers} subscribers')
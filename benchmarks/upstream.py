@@ -0,0 +1,62 @@
+"""
+Benchmark Upstreams - Local stand-ins for n8n and SMTP
+
+StubN8n answers every POST with a fixed chat reply after an optional
+delay, so /api/chat is measured without a network dependency. SMTP needs
+no server: the benchmark disables the delivery worker, so contact jobs
+are only queued.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY = {'output': 'Thanks for reaching out! A growth engineer will follow up with a tailored plan.'}
+
+
+class StubN8n:
+    """n8n chat webhook on 127.0.0.1 with a configurable response delay"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Header and body go out in separate writes
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                stub.requests += 1
+                if stub.delay:
+                    time.sleep(stub.delay)
+                body = json.dumps(REPLY).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return f'http://{host}:{port}/webhook/chat'
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name='stub-n8n', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,109 @@
+"""
+DUODRIVEN CLI Commands
+
+Usage: flask --app app <command>
+"""
+
+import click
+
+
+def register_commands(app):
+    """Register maintenance commands on the app's CLI"""
+
+    @app.cli.command('render-posts')
+    @click.option('--all', 'render_all', is_flag=True,
+                  help='Re-render every post, not only stale ones.')
+    @click.option('--batch-size', default=200, show_default=True)
+    def render_posts(render_all, batch_size):
+        """Backfill stored HTML for blog posts."""
+        from models import db, BlogPost
+
+        query = BlogPost.query.order_by(BlogPost.id)
+        rendered = 0
+        last_id = 0
+        while True:
+            batch = query.filter(BlogPost.id > last_id).limit(batch_size).all()
+            if not batch:
+                break
+            for post in batch:
+                if render_all or post.needs_render:
+                    post.store_render()
+                    rendered += 1
+            last_id = batch[-1].id
+            db.session.commit()
+            db.session.expunge_all()
+
+        click.echo(f'Rendered {rendered} post(s)')
+
+    @app.cli.command('rebuild-tags')
+    def rebuild_tags():
+        """Rebuild the post_tags and tag_counts index from BlogPost.tags."""
+        from models import db
+        from services.tags import rebuild_tag_index
+
+        count = rebuild_tag_index()
+        db.session.commit()
+        click.echo(f'Indexed {count} published tag(s)')
+
+    @app.cli.command('rebuild-links')
+    def rebuild_links():
+        """Recompute stored previous/next and related post links."""
+        from models import db
+        from services.post_links import refresh_post_links
+
+        count = refresh_post_links()
+        db.session.commit()
+        click.echo(f'Updated links of {count} post(s)')
+
+    @app.cli.command('rebuild-search')
+    def rebuild_search():
+        """Rebuild the blog full-text search index from blog_posts."""
+        from models import db
+        from services.search import rebuild_search_index
+
+        if db.engine.dialect.name != 'sqlite':
+            click.echo('No search index: full-text search needs SQLite, other databases use LIKE')
+            return
+        with db.engine.begin() as conn:
+            rebuild_search_index(conn)
+        click.echo('Search index rebuilt')
+
+    @app.cli.command('deliver')
+    def deliver():
+        """Deliver due contact-form emails and webhooks, then exit."""
+        from services.delivery import delivery_queue
+
+        count = delivery_queue.process_due()
+        click.echo(f'Processed {count} delivery job(s)')
+
+    @app.cli.command('migrate')
+    def migrate_database():
+        """Apply pending database migrations."""
+        from migrations import migrate
+
+        applied = migrate()
+        if applied:
+            click.echo(f"Applied migration(s) {', '.join(map(str, applied))}")
+        else:
+            click.echo('Database is up to date')
+
+    @app.cli.command('check-indexes')
+    @click.option('--verbose', '-v', is_flag=True, help='Print every query plan.')
+    def check_indexes(verbose):
+        """EXPLAIN the hot queries and fail if one scans a table or sorts."""
+        from models import db
+        from migrations import check_indexes as run_check
+
+        if db.engine.dialect.name != 'sqlite':
+            raise click.ClickException('check-indexes reads SQLite query plans')
+
+        failures = 0
+        for name, plan, problems in run_check():
+            status = 'FAIL' if problems else 'ok'
+            failures += bool(problems)
+            click.echo(f'{status:4}  {name}')
+            for line in plan if verbose else problems:
+                click.echo(f'      {line}')
+
+        if failures:
+            raise click.ClickException(f'{failures} query(s) not fully served by an index')
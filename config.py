@@ -8,6 +8,80 @@ class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'duodriven-default-secret-key-change-in-production')
     N8N_WEBHOOK_URL = os.getenv('N8N_WEBHOOK_URL', '')
     CONTACT_WEBHOOK_URL = os.getenv('CONTACT_WEBHOOK_URL', '')
+    
+    # Contact form email notifications
+    SMTP_SERVER = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
+    SMTP_PORT = int(os.getenv('SMTP_PORT', 587))
+    SMTP_USERNAME = os.getenv('SMTP_USERNAME', '')
+    SMTP_PASSWORD = os.getenv('SMTP_PASSWORD', '')
+    CONTACT_RECIPIENT = os.getenv('CONTACT_RECIPIENT', 'morissonlarry40@gmail.com')
+    
+    # Background delivery of contact emails/webhooks: failed jobs are
+    # retried with exponential backoff up to DELIVERY_MAX_ATTEMPTS times
+    DELIVERY_WORKER_ENABLED = os.getenv('DELIVERY_WORKER_ENABLED', 'true').lower() == 'true'
+    DELIVERY_MAX_ATTEMPTS = int(os.getenv('DELIVERY_MAX_ATTEMPTS', 8))
+    
+    # Blog view counter: buffered views are written every N seconds or
+    # once this many views are pending, whichever comes first
+    VIEW_FLUSH_INTERVAL = int(os.getenv('VIEW_FLUSH_INTERVAL', 10))
+    VIEW_FLUSH_THRESHOLD = int(os.getenv('VIEW_FLUSH_THRESHOLD', 200))
+    
+    # Chat proxy: keep-alive connections to n8n and the number of threads
+    # per worker that may wait on it at once
+    CHAT_POOL_SIZE = int(os.getenv('CHAT_POOL_SIZE', 8))
+    CHAT_MAX_CONCURRENCY = int(os.getenv('CHAT_MAX_CONCURRENCY', 4))
+    CHAT_CONNECT_TIMEOUT = int(os.getenv('CHAT_CONNECT_TIMEOUT', 5))
+    CHAT_READ_TIMEOUT = int(os.getenv('CHAT_READ_TIMEOUT', 60))
+    
+    # Opt-in cache of replies to sessions' opening questions, shared by
+    # the workers through CHAT_CACHE_DB (services.chat_cache)
+    CHAT_CACHE_ENABLED = os.getenv('CHAT_CACHE_ENABLED', 'false').lower() == 'true'
+    CHAT_CACHE_DB = os.getenv('CHAT_CACHE_DB', '/tmp/duodriven-chat-cache.db')
+    CHAT_CACHE_TTL = int(os.getenv('CHAT_CACHE_TTL', 86400))
+    CHAT_CACHE_MAX_ENTRIES = int(os.getenv('CHAT_CACHE_MAX_ENTRIES', 500))
+    
+    # Seconds /api/v1/stats may serve a cached snapshot (?fresh=1 bypasses)
+    STATS_MAX_AGE = int(os.getenv('STATS_MAX_AGE', 30))
+    
+    # Maximum posts accepted by POST /api/v1/posts/bulk
+    BULK_MAX_POSTS = int(os.getenv('BULK_MAX_POSTS', 500))
+    
+    # Largest upload accepted by POST /api/v1/newsletter/import
+    NEWSLETTER_IMPORT_MAX_BYTES = int(os.getenv('NEWSLETTER_IMPORT_MAX_BYTES', 50 * 1024 * 1024))
+    
+    # Public origin used in sitemaps; sitemaps with more URLs than
+    # SITEMAP_MAX_URLS are split into a sitemap index
+    SITE_URL = os.getenv('SITE_URL', 'https://duodriven.com')
+    SITEMAP_MAX_URLS = int(os.getenv('SITEMAP_MAX_URLS', 50000))
+    
+    # Full-page cache for the static marketing routes
+    PAGE_CACHE_ENABLED = os.getenv('PAGE_CACHE_ENABLED', 'true').lower() == 'true'
+    
+    # Minify rendered HTML (keeps <pre>/<code> and <script> blocks intact)
+    HTML_MINIFY = os.getenv('HTML_MINIFY', 'false').lower() == 'true'
+    
+    # Prometheus metrics on /metrics; with METRICS_TOKEN set, scrapers
+    # must send "Authorization: Bearer <token>". Off unless a token is set
+    # or METRICS_ENABLED=true says the endpoint is only reachable from
+    # inside the network (nginx denies /metrics either way)
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true' if METRICS_TOKEN else 'false').lower() == 'true'
+    
+    # Limits on the public POST endpoints, shared by all workers through
+    # RATE_LIMIT_DB: per-client "<burst>/<second|minute|hour|day>" token
+    # buckets (429) and a cap on requests in progress (503); 0 disables
+    # either. Clients are keyed on X-Forwarded-For as set by the
+    # RATE_LIMIT_PROXY_COUNT reverse proxies in front (0 = no proxy).
+    RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+    RATE_LIMIT_DB = os.getenv('RATE_LIMIT_DB', '/tmp/duodriven-ratelimit.db')
+    RATE_LIMIT_PROXY_COUNT = int(os.getenv('RATE_LIMIT_PROXY_COUNT', 1))
+    RATE_LIMIT_LEASE_TTL = int(os.getenv('RATE_LIMIT_LEASE_TTL', 300))
+    RATE_LIMIT_CHAT = os.getenv('RATE_LIMIT_CHAT', '20/minute')
+    RATE_LIMIT_CHAT_CONCURRENCY = int(os.getenv('RATE_LIMIT_CHAT_CONCURRENCY', 12))
+    RATE_LIMIT_CONTACT = os.getenv('RATE_LIMIT_CONTACT', '10/hour')
+    RATE_LIMIT_CONTACT_CONCURRENCY = int(os.getenv('RATE_LIMIT_CONTACT_CONCURRENCY', 8))
+    RATE_LIMIT_NEWSLETTER = os.getenv('RATE_LIMIT_NEWSLETTER', '10/hour')
+    RATE_LIMIT_NEWSLETTER_CONCURRENCY = int(os.getenv('RATE_LIMIT_NEWSLETTER_CONCURRENCY', 8))
 
 class DevelopmentConfig(Config):
     """Development configuration"""
@@ -23,6 +97,8 @@ class TestingConfig(Config):
     """Testing configuration"""
     DEBUG = True
     TESTING = True
+    VIEW_FLUSH_THRESHOLD = 1
+    RATE_LIMIT_ENABLED = False
 
 # Configuration dictionary
 config = {
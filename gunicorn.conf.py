@@ -0,0 +1,51 @@
+"""
+Gunicorn configuration for production
+
+Usage: gunicorn -c gunicorn.conf.py wsgi:app
+"""
+import os
+import shutil
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', 4))
+
+# Threaded workers: a chat request waiting on n8n holds one thread, not a
+# whole worker. CHAT_MAX_CONCURRENCY (default 4) keeps at least
+# threads - CHAT_MAX_CONCURRENCY threads per worker free for page traffic.
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+
+# Chat replies can take up to CHAT_READ_TIMEOUT seconds between chunks
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 75))
+keepalive = 5
+
+# Build the app once in the master and fork it into the workers (see
+# wsgi.py). Workers start in milliseconds and share the imported code and
+# compiled templates. A HUP re-forks the already-loaded code, so deploy
+# with a restart rather than a reload.
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+# Prometheus metrics: every worker writes its samples to files here and
+# /metrics sums them (services.metrics). Cleared when the master starts.
+# Counts from exited workers stay in the totals; their in-flight gauges
+# are dropped.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/duodriven-metrics')
+# The preloaded app creates its metrics before on_starting runs
+os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+
+def on_starting(server):
+    path = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+    # Concurrency slots held by a previous master's workers are stale
+    from services.rate_limit import release_leases
+    release_leases()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+    # Free the rate limiter slots of a worker that died mid-request
+    from services.rate_limit import release_leases
+    release_leases(worker.pid)
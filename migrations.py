@@ -0,0 +1,252 @@
+"""
+DUODRIVEN Database Migrations
+
+Versioned, forward-only schema changes. Each migration runs once per
+database and is recorded in schema_migrations. Tables (and the indexes
+declared on the models) are created by db.create_all(), so migrations
+only have to bring existing databases up to date and are written to be
+no-ops on a fresh one.
+
+To change the schema: update models.py, then append a migration here
+with the next version number. Never edit a migration that has shipped.
+
+    flask --app app migrate          apply pending migrations
+    flask --app app check-indexes    EXPLAIN the hot queries
+"""
+
+from datetime import datetime
+from sqlalchemy import inspect, text, or_, and_, select, table, column
+
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """Register a migration; fn(conn) receives a connection inside the migration transaction"""
+    def decorator(fn):
+        MIGRATIONS.append((version, description, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return decorator
+
+
+def _create_indexes(conn, table_name, names):
+    from models import db
+
+    model_table = db.metadata.tables[table_name]
+    for index in model_table.indexes:
+        if index.name in names:
+            index.create(conn, checkfirst=True)
+
+
+@migration(1, 'Add columns and indexes introduced before versioned migrations')
+def add_missing_columns(conn):
+    from models import db
+
+    inspector = inspect(conn)
+    for model_table in db.metadata.sorted_tables:
+        table_name = model_table.name
+        if not inspector.has_table(table_name):
+            continue
+        existing = {c['name'] for c in inspector.get_columns(table_name)}
+        for col in model_table.columns:
+            if col.name in existing:
+                continue
+            column_type = col.type.compile(dialect=conn.dialect)
+            conn.execute(text(f'ALTER TABLE {table_name} ADD COLUMN {col.name} {column_type}'))
+    _create_indexes(conn, 'blog_posts', {'ix_blog_posts_external_id'})
+    _create_indexes(conn, 'post_tags', {'ix_post_tags_post_id'})
+    _create_indexes(conn, 'tag_counts', {'ix_tag_counts_count'})
+    _create_indexes(conn, 'slug_redirects', {'ix_slug_redirects_post_id'})
+    _create_indexes(conn, 'delivery_jobs', {'ix_delivery_jobs_due'})
+
+
+@migration(2, 'Composite indexes for blog listing, API and admin queries')
+def add_query_indexes(conn):
+    _create_indexes(conn, 'blog_posts', {
+        'ix_blog_posts_status_published_at',
+        'ix_blog_posts_status_category_published_at',
+        'ix_blog_posts_status_created_at',
+        'ix_blog_posts_status_scheduled_for',
+        'ix_blog_posts_created_at',
+        'ix_blog_posts_updated_at',
+    })
+    _create_indexes(conn, 'contact_submissions', {'ix_contact_submissions_status'})
+    _create_indexes(conn, 'newsletter_subscribers', {'ix_newsletter_subscribers_status_subscribed_at'})
+    # Let the planner pick between the new indexes
+    conn.execute(text('ANALYZE'))
+
+
+@migration(3, 'Store precomputed previous/next and related post links')
+def add_post_links(conn):
+    from services.post_links import refresh_post_links
+
+    columns = {c['name'] for c in inspect(conn).get_columns('blog_posts')}
+    if 'links' not in columns:
+        conn.execute(text('ALTER TABLE blog_posts ADD COLUMN links JSON'))
+    refresh_post_links(conn)
+
+
+@migration(4, 'Full-text search index over blog posts (SQLite FTS5)')
+def add_search_index(conn):
+    from services.search import create_search_index
+
+    create_search_index(conn)
+
+
+@migration(5, 'Track subscriber changes for incremental export')
+def add_subscriber_updated_at(conn):
+    from models import NewsletterSubscriber
+
+    columns = {c['name'] for c in inspect(conn).get_columns('newsletter_subscribers')}
+    if 'updated_at' not in columns:
+        column_type = NewsletterSubscriber.__table__.c.updated_at.type.compile(dialect=conn.dialect)
+        conn.execute(text(f'ALTER TABLE newsletter_subscribers ADD COLUMN updated_at {column_type}'))
+    conn.execute(text(
+        'UPDATE newsletter_subscribers SET updated_at = COALESCE(unsubscribed_at, subscribed_at) '
+        'WHERE updated_at IS NULL'
+    ))
+    _create_indexes(conn, 'newsletter_subscribers', {'ix_newsletter_subscribers_updated_at'})
+
+
+@migration(6, 'Index subscriber export windows by status and id')
+def add_subscriber_status_id_index(conn):
+    _create_indexes(conn, 'newsletter_subscribers', {'ix_newsletter_subscribers_status_id'})
+    conn.execute(text('ANALYZE newsletter_subscribers'))
+
+
+@migration(7, 'Backfill published_at of published posts')
+def backfill_published_at(conn):
+    from services.post_links import refresh_post_links
+
+    # Keyset cursors on (published_at, id) stop at a NULL published_at
+    result = conn.execute(text(
+        "UPDATE blog_posts SET published_at = COALESCE(created_at, CURRENT_TIMESTAMP) "
+        "WHERE status = 'published' AND published_at IS NULL"
+    ))
+    if result.rowcount:
+        refresh_post_links(conn)
+
+
+@migration(8, 'Backfill the post tag index')
+def backfill_tag_index(conn):
+    from services.tags import rebuild_tag_index
+
+    # Databases from before the tag index have posts but empty post_tags
+    rebuild_tag_index(conn)
+
+
+def migrate():
+    """
+    Create missing tables and apply pending migrations; returns the
+    versions applied. On SQLite the whole run holds the write lock, so
+    workers starting together apply each migration once.
+    """
+    from models import db, SchemaMigration
+
+    applied = []
+    with db.engine.connect() as conn:
+        if conn.dialect.name == 'sqlite':
+            conn.exec_driver_sql('BEGIN IMMEDIATE')
+        db.metadata.create_all(conn)
+        done = {v for (v,) in conn.execute(SchemaMigration.__table__.select().with_only_columns(
+            SchemaMigration.version
+        ))}
+        for version, description, fn in MIGRATIONS:
+            if version in done:
+                continue
+            fn(conn)
+            conn.execute(SchemaMigration.__table__.insert().values(
+                version=version, description=description, applied_at=datetime.utcnow()
+            ))
+            applied.append(version)
+        conn.commit()
+    return applied
+
+
+# ============================================
+# INDEX CHECK
+# ============================================
+
+def hot_queries():
+    """(name, statement) for the queries run on every page view or API poll"""
+    from models import db, BlogPost, PostTag, NewsletterSubscriber, ContactSubmission
+
+    now = datetime.utcnow()
+    published = BlogPost.query.filter(BlogPost.status == 'published')
+
+    def newest(query, column):
+        return query.order_by(column.desc(), BlogPost.id.desc()).limit(10)
+
+    def after(query, column):
+        return newest(query.filter(or_(column < now, and_(column == now, BlogPost.id < 100))), column)
+
+    return [
+        ('blog index', newest(published, BlogPost.published_at)),
+        ('blog index, next page', after(published, BlogPost.published_at)),
+        ('blog index by category', newest(published.filter(BlogPost.category == 'ai'), BlogPost.published_at)),
+        ('blog index by tag', newest(
+            published.join(PostTag, PostTag.post_id == BlogPost.id).filter(PostTag.tag == 'seo'),
+            BlogPost.published_at
+        )),
+        ('blog categories', db.session.query(BlogPost.category, db.func.count(BlogPost.id))
+            .filter(BlogPost.status == 'published').group_by(BlogPost.category)),
+        ('post by slug', published.filter(BlogPost.slug == 'example')),
+        ('post links refresh', published.with_entities(BlogPost.id, BlogPost.slug)
+            .order_by(BlogPost.published_at, BlogPost.id)),
+        ('api posts', newest(BlogPost.query, BlogPost.created_at)),
+        ('api posts by status', after(BlogPost.query.filter(BlogPost.status == 'draft'), BlogPost.created_at)),
+        ('search', select(column('rowid')).select_from(table('post_search'))
+            .where(text("post_search MATCH '\"seo\"*'"))),
+        ('post by external_id', BlogPost.query.filter(BlogPost.external_id == 'n8n-1')),
+        ('due scheduled posts', BlogPost.query.filter(
+            BlogPost.status == 'scheduled', BlogPost.scheduled_for <= now
+        )),
+        ('feed version', db.session.query(db.func.max(BlogPost.updated_at))),
+        ('published count', published.with_entities(db.func.count(BlogPost.id))),
+        ('active subscribers', NewsletterSubscriber.query.filter(NewsletterSubscriber.status == 'active')),
+        ('subscriber export', NewsletterSubscriber.query.filter(
+            NewsletterSubscriber.status == 'active', NewsletterSubscriber.id > 1000
+        ).order_by(NewsletterSubscriber.id).limit(1000)),
+        ('subscriber sync', NewsletterSubscriber.query.filter(
+            NewsletterSubscriber.updated_at >= now, NewsletterSubscriber.updated_at < now
+        ).order_by(NewsletterSubscriber.updated_at, NewsletterSubscriber.id).limit(1000)),
+        ('subscriber import', NewsletterSubscriber.query.filter(
+            NewsletterSubscriber.email.in_(['a@example.com', 'b@example.com'])
+        ).with_entities(NewsletterSubscriber.email, NewsletterSubscriber.status)),
+        ('new contacts', ContactSubmission.query.filter(ContactSubmission.status == 'new')
+            .with_entities(db.func.count(ContactSubmission.id))),
+    ]
+
+
+def explain(statement):
+    """SQLite query plan lines for a query"""
+    from models import db
+
+    if hasattr(statement, 'statement'):
+        statement = statement.statement
+    sql = str(statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}))
+    with db.engine.connect() as conn:
+        return [row[-1] for row in conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}')]
+
+
+def unindexed(plan):
+    """Plan lines that read a whole table or sort rows outside an index"""
+    return [
+        line for line in plan
+        if (line.startswith('SCAN ') and ' USING ' not in line and not _fts_match(line))
+        or line.startswith('USE TEMP B-TREE')
+    ]
+
+
+def _fts_match(line):
+    # FTS5 answers MATCH from its own index: "SCAN t VIRTUAL TABLE INDEX 0:M4"
+    return ' VIRTUAL TABLE INDEX ' in line and ':M' in line
+
+
+def check_indexes():
+    """[(name, plan, problems)] for every hot query"""
+    results = []
+    for name, statement in hot_queries():
+        plan = explain(statement)
+        results.append((name, plan, unindexed(plan)))
+    return results
@@ -2,13 +2,28 @@
 DUODRIVEN Database Models
 """
 
+import sqlite3
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 from slugify import slugify
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 
 db = SQLAlchemy()
 
 
+# pysqlite only opens a transaction before INSERT/UPDATE/DELETE, so a
+# SAVEPOINT taken first (services.slugs) would be the outermost transaction
+# and its RELEASE would commit. Open one just before such a savepoint;
+# plain reads keep running outside a transaction and hold no lock.
+
+@event.listens_for(Engine, 'savepoint')
+def _sqlite_begin_before_savepoint(conn, name):
+    dbapi_connection = conn.connection.dbapi_connection
+    if isinstance(dbapi_connection, sqlite3.Connection) and not dbapi_connection.in_transaction:
+        dbapi_connection.execute('BEGIN')
+
+
 class BlogPost(db.Model):
     """Blog post model for dynamic content management"""
     __tablename__ = 'blog_posts'
@@ -20,6 +35,14 @@ class BlogPost(db.Model):
     content = db.Column(db.Text, nullable=False)
     featured_image = db.Column(db.String(500))
     
+    # Rendered content (produced on write, see render_content)
+    html_content = db.Column(db.Text)
+    toc_html = db.Column(db.Text)
+    render_version = db.Column(db.String(40))
+    
+    # Previous/next and related post links (see services.post_links)
+    links = db.Column(db.JSON)
+    
     # SEO
     meta_title = db.Column(db.String(70))
     meta_description = db.Column(db.String(160))
@@ -44,7 +67,19 @@ class BlogPost(db.Model):
     
     # n8n tracking
     source = db.Column(db.String(50), default='manual')  # manual, n8n, api
-    external_id = db.Column(db.String(100))
+    external_id = db.Column(db.String(100), index=True)
+    
+    # Indexes for the listing queries in routes/blog.py and routes/api.py
+    # (see migrations.HOT_QUERIES); SQLite appends the id to every index,
+    # so ORDER BY <column> DESC, id DESC is served without a sort
+    __table_args__ = (
+        db.Index('ix_blog_posts_status_published_at', 'status', 'published_at'),
+        db.Index('ix_blog_posts_status_category_published_at', 'status', 'category', 'published_at'),
+        db.Index('ix_blog_posts_status_created_at', 'status', 'created_at'),
+        db.Index('ix_blog_posts_status_scheduled_for', 'status', 'scheduled_for'),
+        db.Index('ix_blog_posts_created_at', 'created_at'),
+        db.Index('ix_blog_posts_updated_at', 'updated_at'),
+    )
     
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -54,6 +89,43 @@ class BlogPost(db.Model):
             word_count = len(self.content.split())
             self.read_time = max(1, word_count // 200)
     
+    @property
+    def needs_render(self):
+        """True when the stored HTML is missing or was rendered with another extension set"""
+        from services.rendering import RENDER_VERSION
+        return self.html_content is None or self.render_version != RENDER_VERSION
+    
+    def render_content(self):
+        """Render Markdown content to HTML and store it alongside the post"""
+        from services.rendering import render_markdown, RENDER_VERSION
+        self.html_content, self.toc_html = render_markdown(self.content)
+        self.render_version = RENDER_VERSION
+    
+    def store_render(self):
+        """
+        Render and save only the HTML columns, leaving updated_at (and so
+        the post's ETag, feed fingerprint and sitemap lastmod) unchanged.
+        The caller commits.
+        """
+        from sqlalchemy.orm.attributes import set_committed_value
+        from services.rendering import render_markdown, RENDER_VERSION
+        html_content, toc_html = render_markdown(self.content)
+        values = {'html_content': html_content, 'toc_html': toc_html, 'render_version': RENDER_VERSION}
+        table = BlogPost.__table__
+        db.session.execute(
+            table.update()
+            .where(table.c.id == self.id)
+            .values(updated_at=table.c.updated_at, **values)
+        )
+        for key, value in values.items():
+            set_committed_value(self, key, value)
+    
+    @property
+    def total_views(self):
+        """Stored views plus views buffered in this worker but not yet flushed"""
+        from services.view_counter import view_counter
+        return (self.views or 0) + (view_counter.pending(self.id) if self.id else 0)
+    
     def to_dict(self):
         """Convert model to dictionary for API responses"""
         return {
@@ -72,7 +144,7 @@ class BlogPost(db.Model):
             'scheduled_for': self.scheduled_for.isoformat() if self.scheduled_for else None,
             'author': self.author,
             'read_time': self.read_time,
-            'views': self.views,
+            'views': self.total_views,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
             'source': self.source,
@@ -80,6 +152,33 @@ class BlogPost(db.Model):
         }
 
 
+class PostTag(db.Model):
+    """Post-tag association, kept in sync with BlogPost.tags by services.tags"""
+    __tablename__ = 'post_tags'
+    
+    tag = db.Column(db.String(100), primary_key=True)
+    post_id = db.Column(db.Integer, db.ForeignKey('blog_posts.id', ondelete='CASCADE'),
+                        primary_key=True, index=True)
+
+
+class TagCount(db.Model):
+    """Number of published posts per tag, maintained by services.tags"""
+    __tablename__ = 'tag_counts'
+    
+    tag = db.Column(db.String(100), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0, index=True)
+
+
+class SlugRedirect(db.Model):
+    """Former slugs of renamed posts, redirected to the post's current URL"""
+    __tablename__ = 'slug_redirects'
+    
+    old_slug = db.Column(db.String(255), primary_key=True)
+    post_id = db.Column(db.Integer, db.ForeignKey('blog_posts.id', ondelete='CASCADE'),
+                        nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
 class ContactSubmission(db.Model):
     """Store contact form submissions"""
     __tablename__ = 'contact_submissions'
@@ -106,6 +205,35 @@ class ContactSubmission(db.Model):
     utm_source = db.Column(db.String(100))
     utm_medium = db.Column(db.String(100))
     utm_campaign = db.Column(db.String(100))
+    
+    __table_args__ = (
+        db.Index('ix_contact_submissions_status', 'status'),
+    )
+
+
+class DeliveryJob(db.Model):
+    """Outgoing email/webhook deliveries, processed by services.delivery"""
+    __tablename__ = 'delivery_jobs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # email, webhook
+    payload = db.Column(db.JSON, nullable=False)
+    contact_id = db.Column(db.Integer, db.ForeignKey('contact_submissions.id'))
+    
+    # Status tracking
+    status = db.Column(db.String(20), default='pending')  # pending, sending, done, failed
+    attempts = db.Column(db.Integer, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+    locked_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    completed_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_delivery_jobs_due', 'status', 'next_attempt_at'),
+    )
 
 
 class NewsletterSubscriber(db.Model):
@@ -122,6 +250,25 @@ class NewsletterSubscriber(db.Model):
     # Timestamps
     subscribed_at = db.Column(db.DateTime, default=datetime.utcnow)
     unsubscribed_at = db.Column(db.DateTime)
+    # Any change, for incremental export (services.newsletter)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Source
     source = db.Column(db.String(50), default='website')
+    
+    __table_args__ = (
+        db.Index('ix_newsletter_subscribers_status_subscribed_at', 'status', 'subscribed_at'),
+        db.Index('ix_newsletter_subscribers_updated_at', 'updated_at'),
+        # Keyset windows of a full export (services.newsletter)
+        db.Index('ix_newsletter_subscribers_status_id', 'status', 'id'),
+    )
+
+
+class SchemaMigration(db.Model):
+    """Migrations applied to this database (see migrations.py)"""
+    __tablename__ = 'schema_migrations'
+    
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    description = db.Column(db.String(200), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
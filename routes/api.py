@@ -2,10 +2,11 @@
 API Routes for n8n Integration and Blog Management
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
 from functools import wraps
 from datetime import datetime
 import os
+from services.rate_limit import rate_limiter
 
 api_bp = Blueprint('api', __name__, url_prefix='/api/v1')
 
@@ -50,23 +51,29 @@ def create_post():
     }
     """
     from models import db, BlogPost
-    from slugify import slugify
+    from services.post_links import link_state, refresh_post_links
+    from services.slugs import claim_slug
+    from services.tags import sync_post_tags
     
     data = request.get_json()
     
     if not data or 'title' not in data or 'content' not in data:
         return jsonify({'error': 'title and content are required'}), 400
     
-    try:
-        # Generate slug from title
-        slug = slugify(data['title'])
-        
-        # Check if slug already exists, append number if needed
-        existing = BlogPost.query.filter_by(slug=slug).first()
+    # A retried request returns the post created the first time
+    if data.get('external_id'):
+        existing = BlogPost.query.filter_by(external_id=str(data['external_id'])).first()
         if existing:
-            count = BlogPost.query.filter(BlogPost.slug.like(f'{slug}%')).count()
-            slug = f'{slug}-{count + 1}'
-        
+            return jsonify({
+                'success': True,
+                'id': existing.id,
+                'slug': existing.slug,
+                'url': f'/blog/{existing.slug}',
+                'status': existing.status,
+                'existing': True
+            })
+    
+    try:
         # Create excerpt if not provided
         excerpt = data.get('excerpt')
         if not excerpt:
@@ -79,7 +86,6 @@ def create_post():
         
         post = BlogPost(
             title=data['title'],
-            slug=slug,
             content=data['content'],
             excerpt=excerpt,
             category=data.get('category', 'digital-marketing'),
@@ -93,6 +99,7 @@ def create_post():
             external_id=data.get('external_id'),
             read_time=read_time
         )
+        post.render_content()
         
         # Set published_at if status is published
         if data.get('status') == 'published':
@@ -100,7 +107,11 @@ def create_post():
         elif data.get('status') == 'scheduled' and data.get('scheduled_for'):
             post.scheduled_for = datetime.fromisoformat(data['scheduled_for'].replace('Z', '+00:00'))
         
-        db.session.add(post)
+        # Inserts the post under the first free slug for its title
+        claim_slug(post, data['title'])
+        sync_post_tags(post)
+        if post.status == 'published':
+            refresh_post_links(changes=[(None, link_state(post))])
         db.session.commit()
         
         return jsonify({
@@ -116,6 +127,58 @@ def create_post():
         return jsonify({'error': str(e)}), 500
 
 
+@api_bp.route('/posts/bulk', methods=['POST'])
+@require_api_key
+def bulk_upsert_posts():
+    """
+    Create or update many posts in one request - n8n backfills and retries
+    
+    Expected JSON: {"posts": [...]} (or a bare list) where each post has
+    the fields of POST /posts plus a required external_id. Posts whose
+    external_id already exists are updated with the fields provided (the
+    slug is kept); the others are created. Everything is written in one
+    transaction and the response has one result per item:
+    {"index": 0, "external_id": "...", "result": "created|updated|unchanged|error", ...}
+    """
+    from models import db
+    from sqlalchemy.exc import IntegrityError
+    from services.posts import upsert_posts
+    
+    data = request.get_json(silent=True)
+    items = data.get('posts') if isinstance(data, dict) else data
+    
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'posts must be a non-empty list'}), 400
+    
+    max_posts = current_app.config.get('BULK_MAX_POSTS', 500)
+    if len(items) > max_posts:
+        return jsonify({'error': f'at most {max_posts} posts per request'}), 413
+    
+    source = 'n8n' if request.headers.get('X-N8N-Workflow') else 'api'
+    try:
+        try:
+            results = upsert_posts(items, source=source)
+            db.session.commit()
+        except IntegrityError:
+            # Another writer took one of the slugs; resolve them again
+            db.session.rollback()
+            results = upsert_posts(items, source=source)
+            db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+    
+    summary = {outcome: 0 for outcome in ('created', 'updated', 'unchanged', 'error')}
+    for result in results:
+        summary[result['result']] += 1
+    
+    return jsonify({
+        'success': summary['error'] == 0,
+        **summary,
+        'results': results
+    })
+
+
 @api_bp.route('/posts', methods=['GET'])
 @require_api_key
 def list_posts():
@@ -126,14 +189,19 @@ def list_posts():
     - status: filter by status (draft, published, scheduled, all)
     - category: filter by category
     - limit: number of posts to return (default 50)
-    - offset: pagination offset
+    - cursor: keyset pagination; pass an empty cursor for the first page,
+      then the returned next_cursor. Totals are only included with
+      include_total=1 (cached for a minute).
+    - offset: legacy offset pagination (used when no cursor is given)
     """
     from models import BlogPost
+    from services.pagination import keyset_paginate, cached_count
     
     status = request.args.get('status', 'all')
     category = request.args.get('category')
     limit = request.args.get('limit', 50, type=int)
     offset = request.args.get('offset', 0, type=int)
+    cursor = request.args.get('cursor')
     
     query = BlogPost.query
     
@@ -142,14 +210,74 @@ def list_posts():
     if category:
         query = query.filter_by(category=category)
     
+    if cursor is not None:
+        try:
+            page = keyset_paginate(query, BlogPost.created_at, BlogPost.id, limit, after=cursor or None)
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        result = {
+            'limit': limit,
+            'next_cursor': page.next_cursor,
+            'posts': [p.to_dict() for p in page.items]
+        }
+        if request.args.get('include_total') in ('1', 'true'):
+            result['total'] = cached_count(query, ('api_posts', status, category))
+        return jsonify(result)
+    
     total = query.count()
-    posts = query.order_by(BlogPost.created_at.desc()).offset(offset).limit(limit).all()
+    page = keyset_paginate(query, BlogPost.created_at, BlogPost.id, limit, offset=offset)
     
     return jsonify({
         'total': total,
         'limit': limit,
         'offset': offset,
-        'posts': [p.to_dict() for p in posts]
+        'next_cursor': page.next_cursor,
+        'posts': [p.to_dict() for p in page.items]
+    })
+
+
+@api_bp.route('/posts/search', methods=['GET'])
+def search_posts():
+    """
+    Full-text search over published posts - public endpoint (no API key required)
+    
+    Query params:
+    - q: search text; the last word matches as a prefix
+    - limit: number of results (default 10, max 50)
+    - offset: pagination offset
+    - suggest: 1 to return matching titles only (autocomplete)
+    """
+    from services.search import search_posts as run_search, suggest_titles
+    
+    q = request.args.get('q', '').strip()[:200]
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    
+    if request.args.get('suggest') in ('1', 'true'):
+        return jsonify({
+            'query': q,
+            'suggestions': [
+                dict(s, url=f"/blog/{s['slug']}") for s in suggest_titles(q, limit=limit)
+            ]
+        })
+    
+    results, total = run_search(q, limit=limit, offset=offset)
+    return jsonify({
+        'query': q,
+        'total': total,
+        'limit': limit,
+        'offset': offset,
+        'results': [{
+            'id': r['id'],
+            'title': r['title'],
+            'slug': r['slug'],
+            'url': f"/blog/{r['slug']}",
+            'category': r['category'],
+            'published_at': r['published_at'].isoformat() if r['published_at'] else None,
+            'title_html': str(r['title_html']),
+            'snippet_html': str(r['snippet_html']),
+            'rank': r['rank']
+        } for r in results]
     })
 
 
@@ -172,7 +300,9 @@ def update_post(post_id):
     All fields are optional - only provided fields will be updated
     """
     from models import db, BlogPost
-    from slugify import slugify
+    from services.post_links import link_state, links_affected, refresh_post_links
+    from services.slugs import rename_post
+    from services.tags import sync_post_tags
     
     post = BlogPost.query.get_or_404(post_id)
     data = request.get_json()
@@ -181,6 +311,8 @@ def update_post(post_id):
         return jsonify({'error': 'No data provided'}), 400
     
     try:
+        before = link_state(post)
+        
         # Update allowed fields
         updatable_fields = [
             'title', 'content', 'excerpt', 'category', 'tags', 
@@ -195,23 +327,31 @@ def update_post(post_id):
                 else:
                     setattr(post, field, data[field])
         
-        # Regenerate slug if title changed
+        # Move to the slug for the new title; the old URL redirects
         if 'title' in data:
-            new_slug = slugify(data['title'])
-            if new_slug != post.slug:
-                existing = BlogPost.query.filter(BlogPost.slug == new_slug, BlogPost.id != post_id).first()
-                if not existing:
-                    post.slug = new_slug
+            rename_post(post, data['title'])
         
         # Update read time if content changed
         if 'content' in data:
             word_count = len(data['content'].split())
             post.read_time = max(1, word_count // 200)
+            post.render_content()
         
         # Set published_at if status changed to published
-        if data.get('status') == 'published' and not post.published_at:
+        if post.status == 'published' and not post.published_at:
             post.published_at = datetime.utcnow()
         
+        # Keep the tag index in sync
+        if 'tags' in data or 'status' in data:
+            sync_post_tags(post)
+        
+        # Titles, slugs, categories and status of published posts show up
+        # in other posts' links; drafts and scheduled posts in none
+        db.session.flush()
+        after = link_state(post)
+        if links_affected(before, after):
+            refresh_post_links(changes=[(before, after)])
+        
         db.session.commit()
         
         return jsonify({
@@ -230,12 +370,19 @@ def update_post(post_id):
 @require_api_key
 def delete_post(post_id):
     """Delete a blog post"""
-    from models import db, BlogPost
+    from models import db, BlogPost, SlugRedirect
+    from services.post_links import link_state, refresh_post_links
+    from services.tags import remove_post_tags
     
     post = BlogPost.query.get_or_404(post_id)
     
     try:
+        before = link_state(post)
+        remove_post_tags(post.id)
+        SlugRedirect.query.filter_by(post_id=post.id).delete(synchronize_session=False)
         db.session.delete(post)
+        if before['status'] == 'published':
+            refresh_post_links(changes=[(before, None)])
         db.session.commit()
         return jsonify({'success': True, 'message': f'Post {post_id} deleted'})
     except Exception as e:
@@ -251,6 +398,8 @@ def publish_scheduled():
     Call this via n8n on a schedule (e.g., every hour)
     """
     from models import db, BlogPost
+    from services.post_links import link_state, refresh_post_links
+    from services.tags import normalize_tags, refresh_tag_counts
     
     now = datetime.utcnow()
     posts = BlogPost.query.filter(
@@ -259,11 +408,18 @@ def publish_scheduled():
     ).all()
     
     published_ids = []
+    published_tags = set()
+    before = [link_state(post) for post in posts]
     for post in posts:
         post.status = 'published'
         post.published_at = now
         published_ids.append(post.id)
+        published_tags.update(normalize_tags(post.tags))
     
+    db.session.flush()
+    refresh_tag_counts(published_tags)
+    if published_ids:
+        refresh_post_links(changes=[(state, link_state(post)) for state, post in zip(before, posts)])
     db.session.commit()
     
     return jsonify({
@@ -288,16 +444,18 @@ def get_post_by_slug(slug):
 # ============================================
 
 @api_bp.route('/newsletter/subscribe', methods=['POST'])
+@rate_limiter.limit('newsletter')
 def newsletter_subscribe():
     """
     Subscribe to newsletter - public endpoint (no API key required)
     """
     from models import db, NewsletterSubscriber
+    from services.newsletter import normalize_email
     
     data = request.get_json()
-    email = data.get('email', '').strip().lower()
+    email = normalize_email(data.get('email', ''))
     
-    if not email or '@' not in email:
+    if not email:
         return jsonify({'error': 'Valid email required'}), 400
     
     try:
@@ -334,21 +492,109 @@ def newsletter_subscribe():
 @api_bp.route('/newsletter/subscribers', methods=['GET'])
 @require_api_key
 def list_subscribers():
-    """List all newsletter subscribers"""
-    from models import NewsletterSubscriber
+    """
+    Export newsletter subscribers, streamed in batches
+    
+    Query params:
+    - status: active (default), unsubscribed or all
+    - format: json (default, {"total", "subscribers"}), ndjson or csv
+    - since: ISO 8601 timestamp; only subscribers changed at or after it.
+      The response's X-Export-Until header is the since for the next sync.
+    """
+    from services.newsletter import (
+        STATUSES, count_subscribers, iter_subscribers, ndjson_chunks, csv_chunks, json_chunks
+    )
+    from services.posts import parse_datetime
     
     status = request.args.get('status', 'active')
-    subscribers = NewsletterSubscriber.query.filter_by(status=status).all()
+    export_format = request.args.get('format', 'json')
+    if status not in STATUSES:
+        return jsonify({'error': f"status must be one of {', '.join(STATUSES)}"}), 400
+    if export_format not in ('json', 'ndjson', 'csv'):
+        return jsonify({'error': 'format must be json, ndjson or csv'}), 400
+    try:
+        since = parse_datetime(request.args.get('since'))
+    except ValueError:
+        return jsonify({'error': 'since must be an ISO 8601 timestamp'}), 400
     
-    return jsonify({
-        'total': len(subscribers),
-        'subscribers': [{
-            'id': s.id,
-            'email': s.email,
-            'name': s.name,
-            'subscribed_at': s.subscribed_at.isoformat() if s.subscribed_at else None
-        } for s in subscribers]
-    })
+    until = datetime.utcnow()
+    batches = iter_subscribers(status, since=since, until=until)
+    headers = {'X-Export-Until': until.isoformat() + 'Z', 'Cache-Control': 'no-store'}
+    
+    if export_format == 'ndjson':
+        body, mimetype = ndjson_chunks(batches), 'application/x-ndjson'
+    elif export_format == 'csv':
+        body, mimetype = csv_chunks(batches), 'text/csv'
+        headers['Content-Disposition'] = f'attachment; filename="subscribers-{until:%Y%m%d-%H%M%S}.csv"'
+    else:
+        total = count_subscribers(status, since=since, until=until)
+        body, mimetype = json_chunks(batches, total), 'application/json'
+    
+    return Response(stream_with_context(body), mimetype=mimetype, headers=headers)
+
+
+@api_bp.route('/newsletter/import', methods=['POST'])
+@require_api_key
+def import_subscribers():
+    """
+    Bulk import newsletter subscribers - lists moved from another provider
+    
+    The list is the request body, or a multipart upload in the "file"
+    field: CSV with a header row (email, plus name or first/last name
+    columns) or NDJSON ({"email", "name"} per line). The format comes
+    from ?format=csv|ndjson, else the content type or file name.
+    
+    Query params:
+    - source: stored on new subscribers (default "import")
+    - reactivate: 1 (default) reactivates unsubscribed emails; 0 skips them
+    
+    Emails are normalized like /newsletter/subscribe. Rows are written in
+    batches that are each committed, so a failed import keeps the batches
+    before it. Response: {"rows", "inserted", "reactivated", "skipped",
+    "skipped_reasons", "errors": [{"line", "error"}]}
+    """
+    import csv
+    import io
+    from models import db
+    from services.newsletter import read_csv, read_ndjson, import_subscribers as run_import
+    
+    max_bytes = current_app.config.get('NEWSLETTER_IMPORT_MAX_BYTES', 50 * 1024 * 1024)
+    if request.content_length is None:
+        return jsonify({'error': 'Content-Length required'}), 411
+    if request.content_length > max_bytes:
+        return jsonify({'error': f'upload larger than {max_bytes} bytes'}), 413
+    
+    upload = request.files.get('file') if request.mimetype == 'multipart/form-data' else None
+    if request.mimetype == 'multipart/form-data' and upload is None:
+        return jsonify({'error': 'file field required'}), 400
+    stream = upload.stream if upload else request.stream
+    filename = (upload.filename or '').lower() if upload else ''
+    mimetype = upload.mimetype if upload else request.mimetype
+    
+    import_format = request.args.get('format')
+    if import_format is None:
+        if filename.endswith(('.ndjson', '.jsonl')) or 'json' in mimetype:
+            import_format = 'ndjson'
+        else:
+            import_format = 'csv'
+    if import_format not in ('csv', 'ndjson'):
+        return jsonify({'error': 'format must be csv or ndjson'}), 400
+    
+    source = (request.args.get('source') or 'import')[:50]
+    reactivate = request.args.get('reactivate', '1').lower() not in ('0', 'false', 'no')
+    
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', errors='replace', newline='')
+    reader = read_csv(text) if import_format == 'csv' else read_ndjson(text)
+    try:
+        summary = run_import(reader, source=source, reactivate=reactivate)
+    except (ValueError, csv.Error) as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+    
+    return jsonify({'success': True, **summary})
 
 
 # ============================================
@@ -358,24 +604,61 @@ def list_subscribers():
 @api_bp.route('/stats', methods=['GET'])
 @require_api_key
 def get_stats():
-    """Get blog and newsletter statistics"""
-    from models import db, BlogPost, NewsletterSubscriber, ContactSubmission
-    
-    stats = {
-        'blog': {
-            'total_posts': BlogPost.query.count(),
-            'published': BlogPost.query.filter_by(status='published').count(),
-            'drafts': BlogPost.query.filter_by(status='draft').count(),
-            'scheduled': BlogPost.query.filter_by(status='scheduled').count(),
-            'total_views': db.session.query(db.func.sum(BlogPost.views)).scalar() or 0
-        },
-        'newsletter': {
-            'total_subscribers': NewsletterSubscriber.query.filter_by(status='active').count()
-        },
-        'contacts': {
-            'total': ContactSubmission.query.count(),
-            'new': ContactSubmission.query.filter_by(status='new').count()
-        }
-    }
+    """
+    Get blog and newsletter statistics
+    
+    Served from a snapshot at most STATS_MAX_AGE seconds old; pass
+    fresh=1 to recompute it.
+    """
+    from copy import deepcopy
+    from services.stats import get_stats as stats_snapshot
+    from services.view_counter import view_counter
+    
+    fresh = request.args.get('fresh') in ('1', 'true')
+    snapshot, generated_at = stats_snapshot(fresh=fresh)
+    
+    stats = deepcopy(snapshot)
+    stats['blog']['total_views'] += view_counter.pending()
+    stats['generated_at'] = generated_at.isoformat()
     
     return jsonify(stats)
+
+
+# ============================================
+# CHAT CACHE
+# ============================================
+
+@api_bp.route('/chat/cache', methods=['GET'])
+@require_api_key
+def chat_cache_stats():
+    """
+    Chat reply cache counters (hits, misses, bypassed) and the most used
+    cached questions
+    """
+    import sqlite3
+    from services.chat_cache import chat_cache
+    
+    try:
+        return jsonify(chat_cache.stats())
+    except sqlite3.Error as e:
+        return jsonify({'error': f'Chat cache unavailable: {e}'}), 503
+
+
+@api_bp.route('/chat/cache', methods=['DELETE'])
+@require_api_key
+def purge_chat_cache():
+    """
+    Purge cached chat replies - after changing the n8n workflow or the
+    site's pricing/services copy
+    
+    Query params:
+    - q: only drop the entry for this question (matched normalized)
+    """
+    import sqlite3
+    from services.chat_cache import chat_cache
+    
+    try:
+        purged = chat_cache.purge(request.args.get('q'))
+    except sqlite3.Error as e:
+        return jsonify({'error': f'Chat cache unavailable: {e}'}), 503
+    return jsonify({'success': True, 'purged': purged})
@@ -2,8 +2,9 @@
 Blog Routes - Public blog pages
 """
 
-from flask import Blueprint, render_template, request, abort
-import markdown
+from flask import Blueprint, render_template, request, abort, url_for, redirect
+from sqlalchemy.orm import defer
+from services.view_counter import view_counter
 
 blog_bp = Blueprint('blog', __name__, url_prefix='/blog')
 
@@ -11,28 +12,41 @@ blog_bp = Blueprint('blog', __name__, url_prefix='/blog')
 @blog_bp.route('/')
 def blog_index():
     """Blog listing page with pagination and filtering"""
-    from models import BlogPost, db
+    from models import BlogPost, PostTag, db
+    from services.tags import popular_tags
+    from services.pagination import keyset_paginate, cached_count
     
     page = request.args.get('page', 1, type=int)
+    after = request.args.get('after')
+    before = request.args.get('before')
     category = request.args.get('category')
     tag = request.args.get('tag')
     per_page = 9
     
-    # Base query - only published posts
-    query = BlogPost.query.filter_by(status='published')
+    # Base query - only published posts, without the post bodies
+    query = BlogPost.query.filter_by(status='published').options(
+        defer(BlogPost.content), defer(BlogPost.html_content), defer(BlogPost.toc_html)
+    )
     
     # Filter by category
     if category:
         query = query.filter_by(category=category)
     
-    # Filter by tag (JSON contains)
+    # Filter by tag (indexed post_tags lookup)
     if tag:
-        query = query.filter(BlogPost.tags.contains([tag]))
-    
-    # Paginate results
-    posts = query.order_by(BlogPost.published_at.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+        query = query.join(PostTag, PostTag.post_id == BlogPost.id).filter(PostTag.tag == tag)
+    
+    # Keyset pagination on (published_at, id); ?page=N is kept for old links
+    try:
+        posts = keyset_paginate(
+            query, BlogPost.published_at, BlogPost.id, per_page,
+            after=after, before=before,
+            offset=(page - 1) * per_page if page > 1 and not (after or before) else None,
+            page=max(page, 1)
+        )
+    except ValueError:
+        abort(400)
+    posts.total = cached_count(query, ('blog_index', category, tag))
     
     # Get categories with counts for sidebar
     categories = db.session.query(
@@ -40,25 +54,44 @@ def blog_index():
         db.func.count(BlogPost.id).label('count')
     ).filter_by(status='published').group_by(BlogPost.category).all()
     
-    # Get popular tags
-    all_posts = BlogPost.query.filter_by(status='published').all()
-    tag_counts = {}
-    for post in all_posts:
-        if post.tags:
-            for t in post.tags:
-                tag_counts[t] = tag_counts.get(t, 0) + 1
-    popular_tags = sorted(tag_counts.items(), key=lambda x: x[1], reverse=True)[:10]
+    def page_url(**cursor):
+        return url_for('blog.blog_index', category=category, tag=tag, **cursor)
     
     return render_template(
         'blog/index.html',
         posts=posts,
+        prev_url=page_url(before=posts.prev_cursor) if posts.has_prev else None,
+        next_url=page_url(after=posts.next_cursor) if posts.has_next else None,
         categories=categories,
-        popular_tags=popular_tags,
+        popular_tags=popular_tags(10),
         current_category=category,
         current_tag=tag
     )
 
 
+@blog_bp.route('/search')
+def blog_search():
+    """Full-text search over published posts"""
+    from services.search import search_posts
+    
+    q = request.args.get('q', '').strip()[:200]
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = 10
+    
+    results, total = search_posts(q, limit=per_page, offset=(page - 1) * per_page) if q else ([], 0)
+    pages = -(-total // per_page)
+    
+    return render_template(
+        'blog/search.html',
+        q=q,
+        results=results,
+        total=total,
+        page=page,
+        prev_url=url_for('blog.blog_search', q=q, page=page - 1) if page > 1 else None,
+        next_url=url_for('blog.blog_search', q=q, page=page + 1) if page < pages else None
+    )
+
+
 @blog_bp.route('/<slug>')
 def blog_post(slug):
     """Individual blog post page"""
@@ -73,40 +106,36 @@ def blog_post(slug):
             post = BlogPost.query.filter_by(slug=slug).first()
         
         if not post:
+            # Renamed posts answer their old URLs with one redirect
+            from services.slugs import redirect_target
+            target = redirect_target(slug)
+            if target:
+                return redirect(url_for('blog.blog_post', slug=target), code=301)
             abort(404)
     
-    # Increment view count
-    post.views += 1
-    db.session.commit()
-    
-    # Convert markdown to HTML
-    md_extensions = ['fenced_code', 'tables', 'toc', 'nl2br']
-    post.html_content = markdown.markdown(post.content, extensions=md_extensions)
-    
-    # Get related posts (same category, excluding current)
-    related = BlogPost.query.filter(
-        BlogPost.category == post.category,
-        BlogPost.id != post.id,
-        BlogPost.status == 'published'
-    ).order_by(BlogPost.published_at.desc()).limit(3).all()
+    # Count the view (buffered, flushed to the database in batches)
+    view_counter.record(post.id)
     
-    # Get next/prev posts
-    prev_post = BlogPost.query.filter(
-        BlogPost.published_at < post.published_at,
-        BlogPost.status == 'published'
-    ).order_by(BlogPost.published_at.desc()).first()
+    # HTML is rendered on write; only posts stored before that (or with an
+    # outdated extension set) are rendered here, once, and persisted
+    # without touching updated_at
+    if post.needs_render:
+        post.store_render()
+        db.session.commit()
     
-    next_post = BlogPost.query.filter(
-        BlogPost.published_at > post.published_at,
-        BlogPost.status == 'published'
-    ).order_by(BlogPost.published_at.asc()).first()
+    # Related and previous/next links are stored on the post when posts
+    # change; previews of unpublished posts query them instead
+    links = post.links
+    if links is None:
+        from services.post_links import live_links
+        links = live_links(post)
     
     return render_template(
         'blog/post.html',
         post=post,
-        related=related,
-        prev_post=prev_post,
-        next_post=next_post
+        related=links['related'],
+        prev_post=links['prev'],
+        next_post=links['next']
     )
 
 
@@ -127,26 +156,12 @@ def blog_tag(tag):
 @blog_bp.route('/feed.xml')
 def rss_feed():
     """RSS feed for blog posts"""
-    from models import BlogPost
-    
-    posts = BlogPost.query.filter_by(status='published').order_by(
-        BlogPost.published_at.desc()
-    ).limit(20).all()
-    
-    return render_template('blog/rss.xml', posts=posts), {
-        'Content-Type': 'application/xml; charset=utf-8'
-    }
+    from services.feeds import feed_cache
+    return feed_cache.rss()
 
 
 @blog_bp.route('/sitemap.xml')
 def blog_sitemap():
-    """Sitemap for blog posts"""
-    from models import BlogPost
-    
-    posts = BlogPost.query.filter_by(status='published').order_by(
-        BlogPost.published_at.desc()
-    ).all()
-    
-    return render_template('blog/sitemap.xml', posts=posts), {
-        'Content-Type': 'application/xml; charset=utf-8'
-    }
+    """Sitemap for blog posts (the site-wide one is /sitemap.xml)"""
+    from services.feeds import feed_cache
+    return feed_cache.blog_sitemap()
@@ -0,0 +1,242 @@
+"""
+Static Assets - Bundled, minified, fingerprinted and precompressed CSS/JS
+
+The build step concatenates each bundle, minifies CSS, and writes
+static/dist/<name>.<hash>.<ext> plus a manifest mapping logical names to
+those files. Templates call asset_urls('css/core.css'), which returns the
+fingerprinted URL when the manifest exists and the individual source
+files (with a content-hash query string) otherwise, e.g. in development.
+
+It then writes .br and .gz siblings at maximum compression for every
+compressible file under static/. The static route serves those directly
+based on Accept-Encoding, so workers never compress static files.
+
+Build with:  python -m services.assets
+"""
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+from flask import url_for, send_from_directory
+
+try:
+    import brotli
+except ImportError:  # brotli is installed with flask-compress
+    brotli = None
+
+# Logical bundle name -> source files under static/, in load order
+BUNDLES = {
+    'css/core.css': ['css/variables.css', 'css/main.css', 'css/components.css', 'css/ultra.css'],
+    'css/deferred.css': ['css/animations.css', 'css/chat-widget.css', 'css/improvements.css'],
+    'css/pillar.css': ['css/variables.css', 'css/main.css', 'css/components.css', 'css/animations.css'],
+    'css/blog.css': ['css/blog.css'],
+    'js/app.js': ['js/utils.js', 'js/particles.js', 'js/animations.js', 'js/chat-widget.js', 'js/main.js'],
+    'js/main.js': ['js/main.js'],
+    'js/blog-search.js': ['js/blog-search.js'],
+}
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+
+# Files worth precompressing, and the sibling suffix per Content-Encoding
+PRECOMPRESS_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.xml', '.txt', '.html', '.ico', '.map')
+PRECOMPRESS_MIN_SIZE = 256
+ENCODING_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+# @charset/@import rules (quoted URLs may themselves contain ';')
+_AT_RULE_RE = re.compile(
+    r'''@(?:charset|import)\s+(?:url\(\s*)?(?:"[^"]*"|'[^']*'|[^'"\s;)]+)\s*\)?[^;]*;\s*''',
+    re.IGNORECASE
+)
+
+
+def _read(static_folder, name):
+    with open(os.path.join(static_folder, name), encoding='utf-8') as f:
+        return f.read()
+
+
+def build_css(sources):
+    """Concatenate and minify stylesheets, hoisting @import rules to the top"""
+    from csscompressor import compress
+
+    at_rules, bodies = [], []
+    for source in sources:
+        at_rules.extend(m.group(0).strip() for m in _AT_RULE_RE.finditer(source))
+        bodies.append(_AT_RULE_RE.sub('', source))
+    return compress('\n'.join(at_rules + bodies))
+
+
+def build_js(sources):
+    """Concatenate scripts (each file is terminated so ASI cannot join them)"""
+    return '\n;\n'.join(source.strip() for source in sources) + '\n'
+
+
+def build_assets(static_folder):
+    """Write every bundle to static/dist and return the manifest"""
+    dist = os.path.join(static_folder, DIST_DIR)
+    os.makedirs(dist, exist_ok=True)
+
+    manifest = {}
+    for name, files in BUNDLES.items():
+        sources = [_read(static_folder, f) for f in files]
+        output = build_css(sources) if name.endswith('.css') else build_js(sources)
+        data = output.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        stem, ext = os.path.splitext(os.path.basename(name))
+        filename = f'{stem}.{digest}{ext}'
+        with open(os.path.join(dist, filename), 'wb') as f:
+            f.write(data)
+        manifest[name] = f'{DIST_DIR}/{filename}'
+
+    # Remove bundles from earlier builds
+    keep = {os.path.basename(path) for path in manifest.values()} | {MANIFEST_NAME}
+    for entry in os.listdir(dist):
+        if entry not in keep and os.path.isfile(os.path.join(dist, entry)):
+            os.remove(os.path.join(dist, entry))
+
+    with open(os.path.join(dist, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def precompress(static_folder):
+    """
+    Write .br and .gz siblings for compressible files under static/.
+    Siblings are only kept when smaller than the original and are
+    rebuilt when the original is newer. Returns the number written.
+    """
+    written = 0
+    for root, _, files in os.walk(static_folder):
+        for name in files:
+            path = os.path.join(root, name)
+            if not name.endswith(PRECOMPRESS_EXTENSIONS):
+                continue
+            with open(path, 'rb') as f:
+                data = f.read()
+            mtime = os.path.getmtime(path)
+            for encoding, suffix in ENCODING_SUFFIXES.items():
+                target = path + suffix
+                if os.path.exists(target) and os.path.getmtime(target) >= mtime:
+                    continue
+                if len(data) < PRECOMPRESS_MIN_SIZE or (encoding == 'br' and brotli is None):
+                    compressed = None
+                elif encoding == 'br':
+                    compressed = brotli.compress(data, quality=11)
+                else:
+                    compressed = gzip.compress(data, compresslevel=9, mtime=0)
+                if compressed is None or len(compressed) >= len(data):
+                    if os.path.exists(target):
+                        os.remove(target)
+                    continue
+                with open(target, 'wb') as f:
+                    f.write(compressed)
+                written += 1
+
+    # Drop siblings whose original no longer exists (old bundles)
+    for root, _, files in os.walk(static_folder):
+        for name in files:
+            for suffix in ENCODING_SUFFIXES.values():
+                if name.endswith(suffix) and not os.path.exists(os.path.join(root, name[:-len(suffix)])):
+                    os.remove(os.path.join(root, name))
+    return written
+
+
+def _precompressed_index(static_folder):
+    """Map each static file with precompressed siblings to its encodings"""
+    index = {}
+    for root, _, files in os.walk(static_folder):
+        for name in files:
+            for encoding, suffix in ENCODING_SUFFIXES.items():
+                if name.endswith(suffix):
+                    original = os.path.relpath(os.path.join(root, name[:-len(suffix)]), static_folder)
+                    index.setdefault(original.replace(os.sep, '/'), set()).add(encoding)
+    return index
+
+
+class Assets:
+    """Resolves logical asset names to URLs for templates"""
+
+    def __init__(self, app=None):
+        self.static_folder = None
+        self.manifest = {}
+        self.precompressed = None
+        self._versions = {}
+        self._send_static_file = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.static_folder = app.static_folder
+        self.manifest = {}
+        # In debug mode always serve the sources so edits show up immediately
+        if not app.debug:
+            path = os.path.join(app.static_folder, DIST_DIR, MANIFEST_NAME)
+            if os.path.exists(path):
+                with open(path) as f:
+                    self.manifest = json.load(f)
+        # Scanned once per worker; in debug mode siblings are checked per request
+        self.precompressed = None if app.debug else _precompressed_index(app.static_folder)
+        app.extensions['assets'] = self
+        app.jinja_env.globals['asset_urls'] = self.urls
+        if 'static' in app.view_functions:
+            self._send_static_file = app.view_functions['static']
+            app.view_functions['static'] = self.send_static
+
+    def urls(self, name):
+        """URLs to include for a logical asset name"""
+        if name in self.manifest:
+            return [url_for('static', filename=self.manifest[name])]
+        files = BUNDLES.get(name, [name])
+        return [url_for('static', filename=f, v=self._version(f)) for f in files]
+
+    def send_static(self, filename):
+        """Static route that serves .br/.gz siblings when the client accepts them"""
+        from services.page_cache import choose_encoding
+
+        encoding = choose_encoding(self._encodings(filename))
+        if encoding is None:
+            return self._send_static_file(filename=filename)
+
+        mimetype, _ = mimetypes.guess_type(filename)
+        response = send_from_directory(
+            self.static_folder,
+            filename + ENCODING_SUFFIXES[encoding],
+            mimetype=mimetype or 'application/octet-stream'
+        )
+        response.headers['Content-Encoding'] = encoding
+        response.headers['Vary'] = 'Accept-Encoding'
+        return response
+
+    def _encodings(self, filename):
+        if self.precompressed is not None:
+            return self.precompressed.get(filename, ())
+        return {
+            encoding for encoding, suffix in ENCODING_SUFFIXES.items()
+            if os.path.isfile(os.path.join(self.static_folder, filename + suffix))
+        }
+
+    def _version(self, filename):
+        path = os.path.join(self.static_folder, filename)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+        cached = self._versions.get(filename)
+        if cached is None or cached[0] != mtime:
+            with open(path, 'rb') as f:
+                cached = (mtime, hashlib.sha256(f.read()).hexdigest()[:12])
+            self._versions[filename] = cached
+        return cached[1]
+
+
+assets = Assets()
+
+
+if __name__ == '__main__':
+    static = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static')
+    for logical, path in build_assets(static).items():
+        print(f'{logical} -> {path}')
+    print(f'Precompressed {precompress(static)} file(s)')
@@ -0,0 +1,156 @@
+"""
+Chat Proxy - Pooled, streaming relay to the n8n chat webhook
+
+Upstream connections are kept alive in a per-process requests.Session.
+Replies can be relayed to the browser as they arrive (NDJSON), and each
+worker caps how many of its threads may wait on n8n at once so chat
+traffic cannot starve page requests.
+"""
+
+import json
+import os
+import threading
+from services.metrics import metrics
+
+# Keys n8n workflows commonly put the reply text under
+REPLY_KEYS = ('output', 'response', 'reply', 'message', 'text')
+
+
+class ChatBusy(Exception):
+    """Raised when the worker already has the maximum number of chats in flight"""
+
+
+class ChatProxy:
+    """Relay chat messages to the n8n webhook"""
+
+    def __init__(self, app=None):
+        self.webhook_url = ''
+        self.pool_size = 8
+        self.max_concurrency = 4
+        self.connect_timeout = 5
+        self.read_timeout = 60
+        self._session = None
+        self._session_pid = None
+        self._slots = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.webhook_url = app.config.get('N8N_WEBHOOK_URL', '')
+        self.pool_size = app.config.get('CHAT_POOL_SIZE', 8)
+        self.max_concurrency = app.config.get('CHAT_MAX_CONCURRENCY', 4)
+        self.connect_timeout = app.config.get('CHAT_CONNECT_TIMEOUT', 5)
+        self.read_timeout = app.config.get('CHAT_READ_TIMEOUT', 60)
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        app.extensions['chat_proxy'] = self
+
+    @property
+    def session(self):
+        """Keep-alive session, created lazily so forked workers never share sockets"""
+        pid = os.getpid()
+        if self._session is None or self._session_pid != pid:
+            with self._lock:
+                if self._session is None or self._session_pid != pid:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    session.headers.update({'Content-Type': 'application/json'})
+                    self._session, self._session_pid = session, pid
+        return self._session
+
+    def acquire(self):
+        """Reserve a chat slot in this worker, raising ChatBusy if none is free"""
+        if not self._slots.acquire(blocking=False):
+            raise ChatBusy()
+
+    def release(self):
+        self._slots.release()
+
+    def post(self, payload, stream=False):
+        """Send a chat message upstream (timed to the response headers)"""
+        with metrics.upstream('n8n_chat') as call:
+            response = self.session.post(
+                self.webhook_url,
+                json=payload,
+                stream=stream,
+                timeout=(self.connect_timeout, self.read_timeout)
+            )
+            if not response.ok:
+                call.outcome = 'error'
+        return response
+
+    def iter_reply(self, response):
+        """
+        Yield reply text from an upstream response as it arrives.
+
+        n8n streaming webhooks send one JSON object per line
+        ({"type": "item", "content": "..."}); those chunks are relayed
+        immediately. Anything else is read to the end and the reply text
+        extracted from the complete body.
+        """
+        buffered = []
+        streaming = None
+        for line in response.iter_lines(decode_unicode=True):
+            if streaming is None:
+                if not line.strip():
+                    continue
+                event = _parse_event(line)
+                streaming = event is not None
+            elif streaming:
+                event = _parse_event(line)
+            if streaming:
+                if event is not None and event.get('type') == 'item' and event.get('content'):
+                    yield event['content']
+            else:
+                buffered.append(line)
+
+        if not streaming and buffered:
+            yield extract_reply('\n'.join(buffered))
+
+
+def _parse_event(line):
+    try:
+        event = json.loads(line)
+    except ValueError:
+        return None
+    if isinstance(event, dict) and event.get('type') in ('begin', 'item', 'end', 'error'):
+        return event
+    return None
+
+
+def parse_reply(body):
+    """Parse a non-streaming n8n reply into a dict for the chat widget"""
+    try:
+        result = json.loads(body)
+    except ValueError:
+        # A streaming workflow answered a non-streaming client
+        events = [_parse_event(line) for line in body.splitlines() if line.strip()]
+        if events and all(events):
+            return {'response': ''.join(e.get('content') or '' for e in events if e['type'] == 'item')}
+        return {'response': body}
+    # Handle array response (n8n sometimes returns array)
+    if isinstance(result, list) and len(result) > 0:
+        result = result[0]
+    if not isinstance(result, dict):
+        return {'response': str(result)}
+    return result
+
+
+def reply_text(result):
+    """Reply text from a parsed reply, or None"""
+    for key in REPLY_KEYS:
+        if result.get(key):
+            return str(result[key])
+    return None
+
+
+def extract_reply(body):
+    """Reply text from a complete upstream body"""
+    return reply_text(parse_reply(body)) or body
+
+
+chat_proxy = ChatProxy()
@@ -0,0 +1,217 @@
+"""
+Chat Cache - Stored replies for the questions visitors ask first
+
+Most chats open with one of a handful of questions (pricing, services,
+how to get in touch), often from the widget's quick actions. When
+CHAT_CACHE_ENABLED is set, the reply to a session's opening message is
+kept under the normalized question and served to the next session that
+opens with the same question, without calling n8n.
+
+Only opening messages are cached or answered from the cache. A session
+that has chatted before has context in the n8n workflow's memory, so its
+messages always go upstream. A cached answer is not in that memory, so
+the workflow will not know about it on the session's next message.
+
+Entries expire CHAT_CACHE_TTL seconds after they were stored, and past
+CHAT_CACHE_MAX_ENTRIES the least recently used are dropped. Entries,
+seen sessions and hit/miss/bypass counters live in CHAT_CACHE_DB (see
+services.local_db), so every worker shares them and a purge from the
+admin endpoint applies everywhere. If the file cannot be used, chats go
+to n8n as if the cache were off.
+"""
+
+import re
+import sqlite3
+import time
+import unicodedata
+from services.local_db import LocalDB
+from services.metrics import metrics
+
+DEFAULT_DB = '/tmp/duodriven-chat-cache.db'
+# Longer messages are specific to the visitor, not FAQs
+MAX_QUESTION_CHARS = 200
+# How long a session counts as having context
+SESSION_TTL = 30 * 86400
+PRUNE_INTERVAL = 60
+TOP_ENTRIES = 20
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS replies (
+    question TEXT PRIMARY KEY,
+    reply TEXT NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS ix_replies_last_used ON replies (last_used);
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    seen REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_sessions_seen ON sessions (seen);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+_NOT_WORD = re.compile(r'[^\w]+')
+
+
+def normalize_question(message):
+    """Case-, punctuation- and whitespace-insensitive form of a question, or None"""
+    if not isinstance(message, str):
+        return None
+    text = _NOT_WORD.sub(' ', unicodedata.normalize('NFKC', message).casefold()).strip()
+    if not text or len(text) > MAX_QUESTION_CHARS:
+        return None
+    return text
+
+
+def _count(conn, name):
+    conn.execute(
+        'INSERT INTO counters (name, value) VALUES (?, 1) '
+        'ON CONFLICT (name) DO UPDATE SET value = value + 1', (name,)
+    )
+    return name
+
+
+class ChatCache:
+    """Shared TTL/LRU cache of replies to opening chat questions"""
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.ttl = 86400
+        self.max_entries = 500
+        self._db = LocalDB(SCHEMA, DEFAULT_DB)
+        self._pruned_at = 0.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('CHAT_CACHE_ENABLED', False)
+        self.ttl = app.config.get('CHAT_CACHE_TTL', 86400)
+        self.max_entries = app.config.get('CHAT_CACHE_MAX_ENTRIES', 500)
+        self._db.configure(app.config.get('CHAT_CACHE_DB') or DEFAULT_DB)
+        app.extensions['chat_cache'] = self
+
+    def lookup(self, message, session_id=None, now=None):
+        """
+        Look a message up and note the session as having context.
+        Returns (question, reply): reply is the cached text or None, and
+        question is the key to store the upstream reply under, or None
+        when this message must not be cached.
+        """
+        if not self.enabled:
+            return None, None
+        now = time.time() if now is None else now
+        question = normalize_question(message)
+
+        def work(conn):
+            if session_id:
+                seen = conn.execute(
+                    'SELECT 1 FROM sessions WHERE session_id = ? AND seen >= ?', (session_id, now - SESSION_TTL)
+                ).fetchone()
+                conn.execute(
+                    'INSERT INTO sessions (session_id, seen) VALUES (?, ?) '
+                    'ON CONFLICT (session_id) DO UPDATE SET seen = excluded.seen', (session_id, now)
+                )
+                if seen:
+                    return _count(conn, 'bypass'), None, None
+            if question is None:
+                return _count(conn, 'bypass'), None, None
+            row = conn.execute(
+                'SELECT reply FROM replies WHERE question = ? AND created >= ?', (question, now - self.ttl)
+            ).fetchone()
+            if row is None:
+                return _count(conn, 'miss'), question, None
+            conn.execute(
+                'UPDATE replies SET hits = hits + 1, last_used = ? WHERE question = ?', (now, question)
+            )
+            return _count(conn, 'hit'), question, row[0]
+
+        try:
+            result, question, reply = self._db.transaction(work)
+        except sqlite3.Error as e:
+            # Chats go upstream as if the cache were off
+            print(f"Chat cache lookup failed: {e}")
+            return None, None
+        # Counted once the transaction has committed
+        metrics.cache_lookup('chat', result)
+        return question, reply
+
+    def store(self, question, reply, now=None):
+        """Keep an upstream reply, evicting expired and least recently used entries"""
+        if not (self.enabled and question and reply and reply.strip()):
+            return
+        now = time.time() if now is None else now
+
+        def work(conn):
+            conn.execute(
+                'INSERT INTO replies (question, reply, created, last_used) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (question) DO UPDATE SET reply = excluded.reply, '
+                'created = excluded.created, last_used = excluded.last_used',
+                (question, reply, now, now)
+            )
+            if now - self._pruned_at > PRUNE_INTERVAL:
+                conn.execute('DELETE FROM replies WHERE created < ?', (now - self.ttl,))
+                conn.execute('DELETE FROM sessions WHERE seen < ?', (now - SESSION_TTL,))
+                self._pruned_at = now
+            conn.execute(
+                'DELETE FROM replies WHERE question IN ('
+                'SELECT question FROM replies ORDER BY last_used DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,)
+            )
+
+        try:
+            self._db.transaction(work)
+        except sqlite3.Error as e:
+            print(f"Chat cache store failed: {e}")
+
+    def purge(self, message=None):
+        """Drop every entry, or the one for this question; returns how many"""
+        question = normalize_question(message) if message else None
+        if message and question is None:
+            return 0
+
+        def work(conn):
+            if question is None:
+                return conn.execute('DELETE FROM replies').rowcount
+            return conn.execute('DELETE FROM replies WHERE question = ?', (question,)).rowcount
+
+        return self._db.transaction(work)
+
+    def stats(self, now=None):
+        """Counters since the cache file was created, and the most used entries"""
+        now = time.time() if now is None else now
+
+        def work(conn):
+            counters = dict(conn.execute('SELECT name, value FROM counters'))
+            (entries,) = conn.execute(
+                'SELECT count(*) FROM replies WHERE created >= ?', (now - self.ttl,)
+            ).fetchone()
+            top = [
+                {'question': question, 'hits': hits, 'age_seconds': int(now - created)}
+                for question, hits, created in conn.execute(
+                    'SELECT question, hits, created FROM replies WHERE created >= ? '
+                    'ORDER BY hits DESC, last_used DESC LIMIT ?', (now - self.ttl, TOP_ENTRIES)
+                )
+            ]
+            return counters, entries, top
+
+        counters, entries, top = self._db.transaction(work)
+        hits, misses = counters.get('hit', 0), counters.get('miss', 0)
+        return {
+            'enabled': self.enabled,
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'ttl': self.ttl,
+            'hits': hits,
+            'misses': misses,
+            'bypassed': counters.get('bypass', 0),
+            'hit_ratio': round(hits / (hits + misses), 3) if hits + misses else None,
+            'top': top,
+        }
+
+
+chat_cache = ChatCache()
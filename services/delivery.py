@@ -0,0 +1,325 @@
+"""
+Delivery Queue - Durable background delivery of contact-form email and webhooks
+
+Request handlers persist a DeliveryJob row and return. A background thread
+in each worker claims due jobs, sends email over a reused SMTP connection
+and posts webhooks, retrying failures with exponential backoff.
+"""
+
+import os
+import random
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from services.metrics import metrics
+
+
+def build_contact_email(contact_data, sender, recipient):
+    """Build the lead notification email for a contact form submission"""
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
+    
+    # Create email message
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = f"🚀 New Lead: {contact_data.get('name', 'Unknown')} - {contact_data.get('company', 'N/A')}"
+    msg['From'] = sender
+    msg['To'] = recipient
+    
+    # Plain text version
+    text_content = f"""
+New Contact Form Submission
+
+Name: {contact_data.get('name', 'N/A')}
+Email: {contact_data.get('email', 'N/A')}
+Company: {contact_data.get('company', 'N/A')}
+Phone: {contact_data.get('phone', 'N/A')}
+Role: {contact_data.get('role', 'N/A')}
+Budget: {contact_data.get('budget', 'N/A')}
+Services: {', '.join(contact_data.get('services', [])) if isinstance(contact_data.get('services'), list) else contact_data.get('services', 'N/A')}
+Timeline: {contact_data.get('timeline', 'N/A')}
+
+Message:
+{contact_data.get('message', 'No message provided')}
+
+Submitted: {contact_data.get('timestamp', datetime.utcnow().isoformat())}
+    """
+    
+    # HTML version
+    html_content = f"""
+    <html>
+    <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; background: #f5f5f5; padding: 20px;">
+        <div style="background: linear-gradient(135deg, #0a0e1a 0%, #1a1f35 100%); padding: 30px; border-radius: 12px;">
+            <h1 style="color: #00d9ff; margin: 0 0 10px 0;">🚀 New Lead Received!</h1>
+            <p style="color: #a0a0b0; margin: 0;">Someone is interested in DUODRIVEN services</p>
+        </div>
+        
+        <div style="background: white; padding: 30px; border-radius: 12px; margin-top: 20px; box-shadow: 0 2px 10px rgba(0,0,0,0.1);">
+            <h2 style="color: #0a0e1a; border-bottom: 2px solid #00d9ff; padding-bottom: 10px;">Contact Details</h2>
+            
+            <table style="width: 100%; border-collapse: collapse;">
+                <tr>
+                    <td style="padding: 10px 0; color: #666; width: 120px;"><strong>Name:</strong></td>
+                    <td style="padding: 10px 0; color: #0a0e1a;">{contact_data.get('name', 'N/A')}</td>
+                </tr>
+                <tr>
+                    <td style="padding: 10px 0; color: #666;"><strong>Email:</strong></td>
+                    <td style="padding: 10px 0;"><a href="mailto:{contact_data.get('email', '')}" style="color: #00d9ff;">{contact_data.get('email', 'N/A')}</a></td>
+                </tr>
+                <tr>
+                    <td style="padding: 10px 0; color: #666;"><strong>Company:</strong></td>
+                    <td style="padding: 10px 0; color: #0a0e1a;">{contact_data.get('company', 'N/A')}</td>
+                </tr>
+                <tr>
+                    <td style="padding: 10px 0; color: #666;"><strong>Phone:</strong></td>
+                    <td style="padding: 10px 0;"><a href="tel:{contact_data.get('phone', '')}" style="color: #00d9ff;">{contact_data.get('phone', 'N/A')}</a></td>
+                </tr>
+                <tr>
+                    <td style="padding: 10px 0; color: #666;"><strong>Role:</strong></td>
+                    <td style="padding: 10px 0; color: #0a0e1a;">{contact_data.get('role', 'N/A')}</td>
+                </tr>
+                <tr>
+                    <td style="padding: 10px 0; color: #666;"><strong>Budget:</strong></td>
+                    <td style="padding: 10px 0; color: #0a0e1a;">{contact_data.get('budget', 'N/A')}</td>
+                </tr>
+                <tr>
+                    <td style="padding: 10px 0; color: #666;"><strong>Services:</strong></td>
+                    <td style="padding: 10px 0; color: #0a0e1a;">{', '.join(contact_data.get('services', [])) if isinstance(contact_data.get('services'), list) else contact_data.get('services', 'N/A')}</td>
+                </tr>
+                <tr>
+                    <td style="padding: 10px 0; color: #666;"><strong>Timeline:</strong></td>
+                    <td style="padding: 10px 0; color: #0a0e1a;">{contact_data.get('timeline', 'N/A')}</td>
+                </tr>
+            </table>
+            
+            <h3 style="color: #0a0e1a; margin-top: 20px;">Message:</h3>
+            <div style="background: #f8f9fa; padding: 15px; border-radius: 8px; border-left: 4px solid #00d9ff;">
+                <p style="margin: 0; color: #333; line-height: 1.6;">{contact_data.get('message', 'No message provided')}</p>
+            </div>
+            
+            <div style="margin-top: 30px; padding-top: 20px; border-top: 1px solid #eee;">
+                <p style="color: #999; font-size: 12px; margin: 0;">
+                    Submitted: {contact_data.get('timestamp', datetime.utcnow().isoformat())}
+                </p>
+            </div>
+        </div>
+        
+        <div style="text-align: center; margin-top: 20px;">
+            <a href="mailto:{contact_data.get('email', '')}" style="display: inline-block; background: linear-gradient(135deg, #00d9ff, #7c3aed); color: white; padding: 12px 30px; border-radius: 8px; text-decoration: none; font-weight: bold;">Reply to Lead</a>
+        </div>
+    </body>
+    </html>
+    """
+    
+    msg.attach(MIMEText(text_content, 'plain'))
+    msg.attach(MIMEText(html_content, 'html'))
+
+    return msg
+
+
+class SMTPMailer:
+    """SMTP client that keeps its connection open between messages"""
+
+    def __init__(self, server, port, username, password, timeout=30):
+        self.server = server
+        self.port = port
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self._conn = None
+
+    @property
+    def configured(self):
+        return bool(self.username and self.password)
+
+    def send(self, msg, recipient):
+        import smtplib
+        try:
+            self._connection().sendmail(self.username, recipient, msg.as_string())
+        except smtplib.SMTPServerDisconnected:
+            # The server dropped the idle connection - reconnect once
+            self.close()
+            self._connection().sendmail(self.username, recipient, msg.as_string())
+
+    def close(self):
+        if self._conn is not None:
+            try:
+                self._conn.quit()
+            except Exception:
+                pass
+            self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            import smtplib
+            conn = smtplib.SMTP(self.server, self.port, timeout=self.timeout)
+            conn.starttls()
+            conn.login(self.username, self.password)
+            self._conn = conn
+        return self._conn
+
+
+class DeliveryQueue:
+    """Database-backed outbox with an in-process delivery thread"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = True
+        self.poll_interval = 5
+        self.max_attempts = 8
+        self.backoff_base = 30
+        self.backoff_max = 3600
+        self.lock_timeout = 300
+        self.batch_size = 20
+        self.mailer = None
+        self._http = None
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get('DELIVERY_WORKER_ENABLED', True)
+        self.poll_interval = app.config.get('DELIVERY_POLL_INTERVAL', 5)
+        self.max_attempts = app.config.get('DELIVERY_MAX_ATTEMPTS', 8)
+        self.backoff_base = app.config.get('DELIVERY_BACKOFF_BASE', 30)
+        self.backoff_max = app.config.get('DELIVERY_BACKOFF_MAX', 3600)
+        self.mailer = SMTPMailer(
+            app.config.get('SMTP_SERVER', 'smtp.gmail.com'),
+            app.config.get('SMTP_PORT', 587),
+            app.config.get('SMTP_USERNAME', ''),
+            app.config.get('SMTP_PASSWORD', '')
+        )
+        app.extensions['delivery_queue'] = self
+
+        if self.enabled:
+            # Pick up jobs left over from before a restart
+            app.before_request(self._ensure_worker)
+
+    def enqueue(self, kind, payload, contact_id=None):
+        """Add a job to the current session; the caller commits, then calls wake()"""
+        from models import db, DeliveryJob
+        job = DeliveryJob(kind=kind, payload=payload, contact_id=contact_id)
+        db.session.add(job)
+        return job
+
+    def wake(self):
+        """Start the worker thread if needed and have it check for due jobs"""
+        if not self.enabled:
+            return
+        self._ensure_worker()
+        self._wakeup.set()
+
+    def process_due(self):
+        """Deliver every job that is due. Returns the number of jobs processed."""
+        from models import db, DeliveryJob
+
+        processed = 0
+        while True:
+            now = datetime.utcnow()
+            stale = now - timedelta(seconds=self.lock_timeout)
+            candidates = [job_id for (job_id,) in db.session.query(DeliveryJob.id).filter(
+                db.or_(
+                    db.and_(DeliveryJob.status == 'pending', DeliveryJob.next_attempt_at <= now),
+                    db.and_(DeliveryJob.status == 'sending', DeliveryJob.locked_at < stale)
+                )
+            ).order_by(DeliveryJob.id).limit(self.batch_size)]
+            db.session.rollback()
+            if not candidates:
+                break
+            for job_id in candidates:
+                if self._claim(job_id, now, stale):
+                    self._run_job(job_id)
+                    processed += 1
+        return processed
+
+    def _claim(self, job_id, now, stale):
+        # Conditional UPDATE so only one worker process gets each job, and
+        # only while it is still due (another worker may have rescheduled it)
+        from models import db, DeliveryJob
+        result = db.session.execute(
+            update(DeliveryJob)
+            .where(DeliveryJob.id == job_id)
+            .where(db.or_(
+                db.and_(DeliveryJob.status == 'pending', DeliveryJob.next_attempt_at <= now),
+                db.and_(DeliveryJob.status == 'sending', DeliveryJob.locked_at < stale)
+            ))
+            .values(status='sending', locked_at=now)
+        )
+        db.session.commit()
+        return result.rowcount == 1
+
+    def _run_job(self, job_id):
+        from models import db, DeliveryJob
+        job = db.session.get(DeliveryJob, job_id)
+        job.attempts = (job.attempts or 0) + 1
+        try:
+            self._deliver(job)
+        except Exception as e:
+            job.last_error = f'{type(e).__name__}: {e}'[:2000]
+            if job.attempts >= self.max_attempts:
+                job.status = 'failed'
+                print(f"Delivery job {job.id} ({job.kind}) failed permanently: {e}")
+            else:
+                job.status = 'pending'
+                job.next_attempt_at = datetime.utcnow() + timedelta(seconds=self._backoff(job.attempts))
+        else:
+            job.status = 'done'
+            job.last_error = None
+            job.completed_at = datetime.utcnow()
+        job.locked_at = None
+        db.session.commit()
+
+    def _deliver(self, job):
+        if job.kind == 'email':
+            if not self.mailer.configured:
+                raise RuntimeError('SMTP credentials not configured')
+            recipient = job.payload['recipient']
+            msg = build_contact_email(job.payload['contact'], self.mailer.username, recipient)
+            with metrics.upstream('smtp'):
+                self.mailer.send(msg, recipient)
+        elif job.kind == 'webhook':
+            with metrics.upstream('webhook'):
+                response = self.http.post(job.payload['url'], json=job.payload['data'], timeout=10)
+                response.raise_for_status()
+        else:
+            raise ValueError(f'Unknown delivery job kind: {job.kind}')
+
+    def _backoff(self, attempts):
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1))
+        return delay * random.uniform(0.8, 1.2)
+
+    @property
+    def http(self):
+        if self._http is None:
+            import requests
+            self._http = requests.Session()
+        return self._http
+
+    def _ensure_worker(self):
+        # Started lazily so each forked worker gets its own thread
+        if self._pid == os.getpid() and self._thread is not None:
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None:
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='delivery-queue', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        from models import db
+        while True:
+            try:
+                with self.app.app_context():
+                    self.process_due()
+                    db.session.remove()
+            except Exception as e:
+                print(f"Delivery worker error: {e}")
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+
+delivery_queue = DeliveryQueue()
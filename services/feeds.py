@@ -0,0 +1,231 @@
+"""
+Feeds - Cached, streamed sitemap and RSS responses
+
+Each feed is versioned by a cheap fingerprint of the blog (number of
+published posts and the latest updated_at), which is also its ETag and
+Last-Modified. Unchanged feeds are answered with 304 or from a per-worker
+copy kept with gzip/brotli variants; after a post changes, the next request
+streams the new feed from a column-only query and caches the result.
+
+Sitemaps list the static pages registered on the app and every published
+post. Above SITEMAP_MAX_URLS URLs /sitemap.xml becomes a sitemap index of
+/sitemap-<n>.xml shards.
+"""
+
+import hashlib
+import threading
+from datetime import timezone
+from flask import current_app, request, Response, stream_with_context, url_for
+from sqlalchemy import func, select
+from werkzeug.http import is_resource_modified
+from services.page_cache import CachedPage, choose_encoding
+
+SITEMAP_MAX_URLS = 50000
+RSS_ITEMS = 20
+XML_MIMETYPE = 'application/xml'
+
+# Endpoints with no URL arguments that are not pages
+EXCLUDED_ENDPOINTS = {'static', 'favicon', 'health_check', 'metrics'}
+# Blueprint endpoints that are listed alongside the app's own pages
+INCLUDED_BLUEPRINT_ENDPOINTS = {'blog.blog_index'}
+
+# (changefreq, priority) per endpoint; other pages are monthly / 0.8
+PAGE_HINTS = {
+    'index': ('weekly', '1.0'),
+    'blog.blog_index': ('daily', '0.8'),
+}
+
+
+class FeedCache:
+    """Per-worker cache of generated XML feeds"""
+
+    def __init__(self, app=None):
+        self.site_url = 'https://duodriven.com'
+        self.max_urls = SITEMAP_MAX_URLS
+        self._feeds = {}
+        self._pages = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.site_url = app.config.get('SITE_URL', 'https://duodriven.com').rstrip('/')
+        self.max_urls = app.config.get('SITEMAP_MAX_URLS', SITEMAP_MAX_URLS)
+        app.extensions['feeds'] = self
+
+    def sitemap(self, shard=None):
+        """
+        /sitemap.xml (shard=None) or one /sitemap-<n>.xml shard.
+        Returns None for a shard that does not exist.
+        """
+        version = blog_version()
+        if self._pages is None:
+            self._pages = static_pages()
+        pages = self._pages
+        total = len(pages) + version[0]
+        shards = max(1, -(-total // self.max_urls))
+
+        if shard is None and shards > 1:
+            return self._respond(('sitemap-index',), version, lambda: _render(
+                'sitemap_index.xml',
+                sitemaps=[f'{self.site_url}/sitemap-{n}.xml' for n in range(1, shards + 1)],
+                lastmod=version[1]
+            ))
+        if shard is not None and not 1 <= shard <= shards:
+            return None
+
+        start = ((shard or 1) - 1) * self.max_urls
+        return self._respond(('sitemap', shard), version, lambda: _render(
+            'sitemap.xml',
+            urls=self._sitemap_urls(pages, start, start + self.max_urls)
+        ))
+
+    def blog_sitemap(self):
+        """Posts only, for /blog/sitemap.xml"""
+        version = blog_version()
+        return self._respond(('blog-sitemap',), version, lambda: _render(
+            'sitemap.xml',
+            urls=self._sitemap_urls([], 0, self.max_urls)
+        ))
+
+    def rss(self):
+        """RSS feed of the latest posts"""
+        version = blog_version()
+        return self._respond(('rss',), version, lambda: _render(
+            'blog/rss.xml',
+            posts=_latest_posts(RSS_ITEMS)
+        ))
+
+    def clear(self):
+        with self._lock:
+            self._feeds.clear()
+
+    def _sitemap_urls(self, pages, start, stop):
+        """(loc, lastmod, changefreq, priority) for entries start..stop"""
+        for path, changefreq, priority in pages[start:stop]:
+            yield self.site_url + path, None, changefreq, priority
+
+        offset = max(0, start - len(pages))
+        limit = stop - start - max(0, len(pages) - start)
+        if limit <= 0:
+            return
+        from models import db, BlogPost
+
+        rows = db.session.execute(
+            select(BlogPost.slug, BlogPost.updated_at, BlogPost.published_at)
+            .where(BlogPost.status == 'published')
+            .order_by(BlogPost.id)
+            .offset(offset)
+            .limit(limit)
+            .execution_options(yield_per=1000)
+        )
+        for slug, updated_at, published_at in rows:
+            yield f'{self.site_url}/blog/{slug}', updated_at or published_at, 'weekly', '0.7'
+
+    def _respond(self, key, version, generate):
+        """Answer from the validators, the cached copy, or by streaming generate()"""
+        count, last_modified = version
+        etag = hashlib.sha1(repr((key, count, last_modified)).encode()).hexdigest()[:20]
+
+        if last_modified is not None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+
+        if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+            response = Response(status=304)
+        else:
+            with self._lock:
+                page = self._feeds.get(key)
+            if page is not None and page.mtime == etag:
+                encoding = choose_encoding(page.variants)
+                response = Response(page.variants[encoding][0], mimetype=XML_MIMETYPE)
+                if encoding:
+                    response.headers['Content-Encoding'] = encoding
+            else:
+                response = Response(
+                    stream_with_context(self._stream_and_store(key, etag, generate())),
+                    mimetype=XML_MIMETYPE
+                )
+
+        response.set_etag(etag, weak=True)
+        response.last_modified = last_modified
+        response.headers['Cache-Control'] = 'public, max-age=300, must-revalidate'
+        response.headers['Vary'] = 'Accept-Encoding'
+        return response
+
+    def _stream_and_store(self, key, etag, chunks):
+        parts = []
+        for chunk in _buffered(chunks):
+            parts.append(chunk)
+            yield chunk
+        page = CachedPage(''.join(parts), etag)
+        with self._lock:
+            self._feeds[key] = page
+
+
+def blog_version():
+    """(published post count, latest change) - the version of every feed"""
+    from models import db, BlogPost
+
+    # Two index lookups (status and updated_at indexes) rather than a table scan
+    return tuple(db.session.execute(
+        select(
+            select(func.count(BlogPost.id)).where(BlogPost.status == 'published').scalar_subquery(),
+            select(func.max(BlogPost.updated_at)).scalar_subquery()
+        )
+    ).one())
+
+
+def static_pages():
+    """(path, changefreq, priority) for the app's argument-free GET pages"""
+    pages, seen = [], set()
+    for rule in current_app.url_map.iter_rules():
+        endpoint = rule.endpoint
+        if (
+            endpoint in seen
+            or endpoint in EXCLUDED_ENDPOINTS
+            or endpoint.startswith('redirect_')
+            or ('.' in endpoint and endpoint not in INCLUDED_BLUEPRINT_ENDPOINTS)
+            or rule.arguments
+            or 'GET' not in rule.methods
+            or rule.rule.startswith('/api/')
+            or rule.rule.endswith('.xml')
+        ):
+            continue
+        seen.add(endpoint)
+        changefreq, priority = PAGE_HINTS.get(endpoint, ('monthly', '0.8'))
+        pages.append((url_for(endpoint), changefreq, priority))
+    return sorted(pages, key=lambda page: page[0])
+
+
+def _latest_posts(limit):
+    from models import db, BlogPost
+
+    return db.session.execute(
+        select(
+            BlogPost.title, BlogPost.slug, BlogPost.excerpt, BlogPost.published_at,
+            BlogPost.category, BlogPost.author, BlogPost.featured_image
+        )
+        .where(BlogPost.status == 'published')
+        .order_by(BlogPost.published_at.desc())
+        .limit(limit)
+    ).all()
+
+
+def _render(template_name, **context):
+    return current_app.jinja_env.get_template(template_name).generate(**context)
+
+
+def _buffered(chunks, size=16384):
+    """Join the template's many small pieces into reasonably sized chunks"""
+    buffer, length = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield ''.join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+feed_cache = FeedCache()
@@ -0,0 +1,104 @@
+"""
+HTML Minification - Opt-in minification of rendered HTML responses
+
+Enabled with HTML_MINIFY=true. <pre>, <textarea> and <code> contents are
+kept verbatim (blog code samples) and <script> blocks, including JSON-LD,
+are never touched. Minified output is memoized per endpoint and rendered
+content, so repeated renders of the same page only pay for a hash.
+
+Values that change on every request (a post's view count) would make
+every render a new page. Templates pass them through the |volatile
+filter: they are cut out before hashing and minifying and put back into
+the memoized page afterwards.
+"""
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from flask import request
+from markupsafe import Markup, escape
+
+import htmlmin
+
+PRE_TAGS = ('pre', 'textarea', 'code')
+
+# Sentinels around |volatile values; an empty pair marks where one goes back
+_OPEN, _CLOSE = '\x02', '\x03'
+_VOLATILE_RE = re.compile('\x02([^\x02\x03]*)\x03')
+
+
+class HTMLMinifier:
+    """Minifies text/html responses produced by render_template"""
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.max_entries = 512
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('HTML_MINIFY', False)
+        self.max_entries = app.config.get('HTML_MINIFY_CACHE_SIZE', 512)
+        app.extensions['html_minifier'] = self
+        app.add_template_filter(self.volatile, 'volatile')
+        if self.enabled:
+            app.after_request(self.process_response)
+
+    def minify(self, html):
+        """Minify an HTML string (returned unchanged when disabled)"""
+        if not self.enabled:
+            return html
+        return htmlmin.minify(
+            html,
+            remove_comments=True,
+            remove_empty_space=False,
+            remove_optional_attribute_quotes=False,
+            pre_tags=PRE_TAGS
+        )
+
+    def volatile(self, value):
+        """Template filter for per-request values, left out of the memo key"""
+        if not self.enabled:
+            return value
+        return Markup(f'{_OPEN}{escape(value)}{_CLOSE}')
+
+    def process_response(self, response):
+        # Skip files, streams, already-encoded bodies and responses with an
+        # ETag (the page cache minifies before computing its validators)
+        if (
+            response.mimetype != 'text/html'
+            or response.direct_passthrough
+            or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or 'ETag' in response.headers
+        ):
+            return response
+
+        html = response.get_data(as_text=True)
+        values = _VOLATILE_RE.findall(html)
+        if values:
+            html = _VOLATILE_RE.sub(_OPEN + _CLOSE, html)
+        key = (request.endpoint, hashlib.sha1(html.encode('utf-8')).digest())
+        with self._lock:
+            minified = self._memo.get(key)
+            if minified is not None:
+                self._memo.move_to_end(key)
+
+        if minified is None:
+            minified = self.minify(html)
+            with self._lock:
+                self._memo[key] = minified
+                while len(self._memo) > self.max_entries:
+                    self._memo.popitem(last=False)
+
+        if values:
+            values = iter(values)
+            minified = re.sub(_OPEN + _CLOSE, lambda m: next(values, ''), minified)
+        response.set_data(minified)
+        return response
+
+
+html_minifier = HTMLMinifier()
@@ -0,0 +1,56 @@
+"""
+Local DB - Small SQLite files shared by the workers on one host
+
+For state every gunicorn worker must see but that does not belong in the
+application database (rate limits, the chat response cache). Each
+process opens its own connection on first use, so workers forked from a
+preloaded master never share a file handle, and every access is one
+short BEGIN IMMEDIATE transaction, which serializes the workers. The
+files are disposable: WAL with synchronous=OFF, schema created on open.
+"""
+
+import os
+import sqlite3
+import threading
+
+
+class LocalDB:
+    """A per-process connection to a shared SQLite file"""
+
+    def __init__(self, schema, path=None):
+        self.schema = schema
+        self.path = path
+        self._conn = None
+        self._conn_pid = None
+        self._lock = threading.Lock()
+
+    def configure(self, path):
+        with self._lock:
+            if path != self.path and self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            self.path = path
+
+    def _connection(self):
+        pid = os.getpid()
+        if self._conn is None or self._conn_pid != pid:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            # The contents are transient; losing the last writes in a crash is fine
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.executescript(self.schema)
+            self._conn, self._conn_pid = conn, pid
+        return self._conn
+
+    def transaction(self, work):
+        """Run work(conn) in a write transaction and return its result"""
+        with self._lock:
+            conn = self._connection()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                result = work(conn)
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+            return result
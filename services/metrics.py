@@ -0,0 +1,231 @@
+"""
+Metrics - Prometheus metrics for requests, database queries and upstreams
+
+A WSGI middleware times every request from the first byte in to the last
+byte out (so streamed chat replies are timed to the end), and records its
+status, response size and the number and total time of the SQLAlchemy
+queries it ran. Calls to n8n, webhooks and SMTP are timed with
+upstream(), and cache_lookup() counts application cache results.
+Everything is served in Prometheus text format on /metrics.
+
+Under gunicorn, PROMETHEUS_MULTIPROC_DIR (set in gunicorn.conf.py) makes
+every worker write its samples to files in that directory and /metrics
+sums them, so any worker answers for all of them. Without it (flask run)
+the metrics are the current process's own.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from flask import request, request_started, abort, Response
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, REGISTRY,
+    CONTENT_TYPE_LATEST, generate_latest, multiprocess
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+QUERY_TIME_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, 1)
+
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Time from request start to last response byte',
+    ['method', 'endpoint'], buckets=LATENCY_BUCKETS
+)
+REQUESTS = Counter(
+    'http_requests', 'Requests by response status',
+    ['method', 'endpoint', 'status']
+)
+RESPONSE_SIZE = Histogram(
+    'http_response_size_bytes', 'Response body bytes sent, after compression',
+    ['endpoint'], buckets=SIZE_BUCKETS
+)
+IN_FLIGHT = Gauge(
+    'http_requests_in_flight', 'Requests being handled', multiprocess_mode='livesum'
+)
+REQUEST_QUERIES = Histogram(
+    'http_request_db_queries', 'SQL statements executed per request',
+    ['endpoint'], buckets=QUERY_COUNT_BUCKETS
+)
+REQUEST_QUERY_TIME = Histogram(
+    'http_request_db_seconds', 'Time spent in SQL statements per request',
+    ['endpoint'], buckets=QUERY_TIME_BUCKETS
+)
+UPSTREAM_DURATION = Histogram(
+    'upstream_request_duration_seconds', 'Calls to n8n, webhooks and SMTP',
+    ['service', 'outcome'], buckets=LATENCY_BUCKETS
+)
+
+CACHE_LOOKUPS = Counter(
+    'cache_lookups', 'Application cache lookups by result (hit, miss, bypass)',
+    ['cache', 'result']
+)
+
+ENDPOINT_KEY = 'duodriven.endpoint'
+
+
+class _RequestStats:
+    __slots__ = ('queries', 'query_time')
+
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0
+
+
+class UpstreamCall:
+    """Handle yielded by Metrics.upstream(); set outcome for failures that do not raise"""
+    __slots__ = ('outcome',)
+
+    def __init__(self):
+        self.outcome = 'ok'
+
+
+class Metrics:
+    """Request, query and upstream instrumentation with a /metrics endpoint"""
+
+    def __init__(self, app=None):
+        self.enabled = True
+        self.token = ''
+        self._local = threading.local()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('METRICS_ENABLED', True)
+        self.token = app.config.get('METRICS_TOKEN', '')
+        app.extensions['metrics'] = self
+        if not self.enabled:
+            return
+
+        multiproc_dir = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+        if multiproc_dir:
+            os.makedirs(multiproc_dir, exist_ok=True)
+
+        app.wsgi_app = _MetricsMiddleware(app.wsgi_app, self)
+        request_started.connect(_remember_endpoint, app)
+        if not event.contains(Engine, 'before_cursor_execute', self._before_query):
+            event.listen(Engine, 'before_cursor_execute', self._before_query)
+            event.listen(Engine, 'after_cursor_execute', self._after_query)
+        app.add_url_rule('/metrics', 'metrics', self.view)
+
+    @contextmanager
+    def upstream(self, service):
+        """Time a call to an external service; an exception counts as an error"""
+        call = UpstreamCall()
+        start = time.perf_counter()
+        try:
+            yield call
+        except Exception as e:
+            call.outcome = 'timeout' if 'timeout' in type(e).__name__.lower() else 'error'
+            raise
+        finally:
+            UPSTREAM_DURATION.labels(service, call.outcome).observe(time.perf_counter() - start)
+
+    def cache_lookup(self, cache, result):
+        CACHE_LOOKUPS.labels(cache, result).inc()
+
+    def view(self):
+        """Prometheus text exposition, summed over all workers"""
+        if self.token and request.headers.get('Authorization') != f'Bearer {self.token}':
+            abort(404)
+        if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = REGISTRY
+        return Response(
+            generate_latest(registry),
+            content_type=CONTENT_TYPE_LATEST,
+            headers={'Cache-Control': 'no-store'}
+        )
+
+    # Query counting: the middleware opens a _RequestStats for the thread
+    # handling the request; queries on other threads are not attributed.
+
+    def _before_query(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    def _after_query(self, conn, cursor, statement, parameters, context, executemany):
+        start = conn.info['query_start'].pop()
+        stats = getattr(self._local, 'stats', None)
+        if stats is not None:
+            stats.queries += 1
+            stats.query_time += time.perf_counter() - start
+
+    def _begin(self):
+        self._local.stats = _RequestStats()
+        IN_FLIGHT.inc()
+        return time.perf_counter()
+
+    def _end(self, environ, start, status, size):
+        stats = getattr(self._local, 'stats', None) or _RequestStats()
+        self._local.stats = None
+        IN_FLIGHT.dec()
+        endpoint = environ.get(ENDPOINT_KEY) or 'none'
+        method = environ.get('REQUEST_METHOD', 'GET')
+        REQUEST_DURATION.labels(method, endpoint).observe(time.perf_counter() - start)
+        REQUESTS.labels(method, endpoint, status).inc()
+        RESPONSE_SIZE.labels(endpoint).observe(size)
+        REQUEST_QUERIES.labels(endpoint).observe(stats.queries)
+        REQUEST_QUERY_TIME.labels(endpoint).observe(stats.query_time)
+
+
+def _remember_endpoint(sender, **extra):
+    # Matched before any before_request handler can short-circuit the request
+    request.environ[ENDPOINT_KEY] = request.endpoint
+
+
+class _MetricsMiddleware:
+    """Times each request until its response iterable is closed"""
+
+    def __init__(self, wsgi_app, metrics):
+        self.wsgi_app = wsgi_app
+        self.metrics = metrics
+
+    def __call__(self, environ, start_response):
+        start = self.metrics._begin()
+        status, length = ['500'], [0]
+
+        def _start_response(status_line, headers, exc_info=None):
+            status[0] = status_line.split(' ', 1)[0]
+            length[0] = int(dict(headers).get('Content-Length') or 0)
+            return start_response(status_line, headers, exc_info)
+
+        try:
+            body = self.wsgi_app(environ, _start_response)
+        except Exception:
+            self.metrics._end(environ, start, status[0], 0)
+            raise
+        file_wrapper = environ.get('wsgi.file_wrapper')
+        if isinstance(file_wrapper, type) and isinstance(body, file_wrapper):
+            # Leave files to the server's sendfile(); timed up to the headers
+            self.metrics._end(environ, start, status[0], length[0])
+            return body
+        return _ClosingIterator(body, lambda size: self.metrics._end(environ, start, status[0], size))
+
+
+class _ClosingIterator:
+    """Counts body bytes and reports them when the server closes the response"""
+
+    def __init__(self, body, on_close):
+        self.body = body
+        self.on_close = on_close
+        self.size = 0
+
+    def __iter__(self):
+        for chunk in self.body:
+            self.size += len(chunk)
+            yield chunk
+
+    def close(self):
+        try:
+            if hasattr(self.body, 'close'):
+                self.body.close()
+        finally:
+            self.on_close(self.size)
+
+
+metrics = Metrics()
@@ -0,0 +1,295 @@
+"""
+Newsletter - Streaming subscriber export and bulk import
+
+Subscribers are read in keyset windows of EXPORT_BATCH rows, selecting
+plain columns rather than ORM objects, and each window is serialized and
+sent before the next is read. Memory stays flat and the worker never
+holds the whole list, however long it is.
+
+Incremental sync (n8n) uses updated_at, which moves on every change
+including unsubscribes and reactivations. A sync covers
+since <= updated_at < until, where until is fixed when the export starts
+and returned to the caller. Passing it back as the next since gives
+back-to-back windows that neither skip nor repeat a change. A full
+export (no since) returns every row; rows it already included may come
+again in the first sync after it.
+
+Imports (a list moved from another ESP) are read row by row from the
+upload and written in batches of IMPORT_BATCH: one query finds which of
+the batch's emails exist, new ones are inserted with one executemany,
+unsubscribed ones are reactivated with one UPDATE, and the batch is
+committed before the next is read.
+"""
+
+import csv
+import io
+import json
+from datetime import datetime
+from sqlalchemy import select, insert, update, and_, or_
+from sqlalchemy.exc import IntegrityError
+
+EXPORT_BATCH = 1000
+IMPORT_BATCH = 500
+MAX_IMPORT_ERRORS = 50
+# Header names other providers export the columns under
+EMAIL_HEADERS = ('email', 'email address', 'e-mail', 'e-mail address', 'email_address')
+NAME_HEADERS = ('name', 'full name', 'full_name')
+FIRST_NAME_HEADERS = ('first name', 'first_name', 'firstname', 'fname')
+LAST_NAME_HEADERS = ('last name', 'last_name', 'lastname', 'lname')
+STATUSES = ('active', 'unsubscribed', 'all')
+EXPORT_FIELDS = ('id', 'email', 'name', 'status', 'source', 'subscribed_at', 'unsubscribed_at', 'updated_at')
+# Characters a spreadsheet would treat as the start of a formula
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _filters(table, status, since, until):
+    clauses = []
+    if status != 'all':
+        clauses.append(table.c.status == status)
+    if since is not None:
+        clauses.append(table.c.updated_at >= since)
+        if until is not None:
+            clauses.append(table.c.updated_at < until)
+    return clauses
+
+
+def count_subscribers(status='active', since=None, until=None):
+    from models import db, NewsletterSubscriber
+
+    table = NewsletterSubscriber.__table__
+    return db.session.execute(
+        select(db.func.count()).select_from(table).where(*_filters(table, status, since, until))
+    ).scalar()
+
+
+def iter_subscribers(status='active', since=None, until=None, batch_size=EXPORT_BATCH):
+    """
+    Yield lists of subscriber rows (mappings with EXPORT_FIELDS). Ordered
+    by id for a full export, or by (updated_at, id) when syncing since a
+    timestamp.
+    """
+    from models import db, NewsletterSubscriber
+
+    table = NewsletterSubscriber.__table__
+    columns = [table.c[field] for field in EXPORT_FIELDS]
+    filters = _filters(table, status, since, until)
+    by_change = since is not None
+    order = (table.c.updated_at, table.c.id) if by_change else (table.c.id,)
+
+    last = None
+    while True:
+        query = select(*columns).where(*filters)
+        if last is not None:
+            if by_change:
+                query = query.where(or_(
+                    table.c.updated_at > last['updated_at'],
+                    and_(table.c.updated_at == last['updated_at'], table.c.id > last['id'])
+                ))
+            else:
+                query = query.where(table.c.id > last['id'])
+        rows = db.session.execute(query.order_by(*order).limit(batch_size)).mappings().all()
+        if not rows:
+            return
+        yield rows
+        if len(rows) < batch_size:
+            return
+        last = rows[-1]
+        # Let the next window see a fresh snapshot instead of pinning one
+        db.session.commit()
+
+
+def _isoformat(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _record(row):
+    return {field: _isoformat(row[field]) for field in EXPORT_FIELDS}
+
+
+def ndjson_chunks(batches):
+    """One JSON object per line, one chunk per window"""
+    for rows in batches:
+        yield ''.join(json.dumps(_record(row)) + '\n' for row in rows)
+
+
+def _csv_cell(value):
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def csv_chunks(batches):
+    """Header row, then one chunk per window"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for rows in batches:
+        for row in rows:
+            writer.writerow([_csv_cell(value) for value in _record(row).values()])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def json_chunks(batches, total):
+    """The original {"total": n, "subscribers": [...]} document, streamed"""
+    yield f'{{"total": {total}, "subscribers": ['
+    first = True
+    for rows in batches:
+        items = ', '.join(json.dumps({
+            'id': row['id'],
+            'email': row['email'],
+            'name': row['name'],
+            'subscribed_at': _isoformat(row['subscribed_at'])
+        }) for row in rows)
+        yield items if first else ', ' + items
+        first = False
+    yield ']}'
+
+
+# ============================================
+# IMPORT
+# ============================================
+
+def normalize_email(value):
+    """Lowercased, trimmed email, or None if it is not a usable address"""
+    email = value.strip().lower() if isinstance(value, str) else ''
+    if not email or '@' not in email or len(email) > 120:
+        return None
+    return email
+
+
+def _header_index(header, names):
+    for i, column in enumerate(header):
+        if column in names:
+            return i
+    return None
+
+
+def read_csv(text):
+    """Yield (line number, {"email", "name"}) from CSV with a header row"""
+    reader = csv.reader(text)
+    header = [column.strip().lower() for column in next(reader, [])]
+    email_at = _header_index(header, EMAIL_HEADERS)
+    if email_at is None:
+        raise ValueError('CSV needs an email column')
+    name_at = _header_index(header, NAME_HEADERS)
+    first_at = _header_index(header, FIRST_NAME_HEADERS)
+    last_at = _header_index(header, LAST_NAME_HEADERS)
+
+    def cell(row, i):
+        return row[i].strip() if i is not None and i < len(row) else ''
+
+    for row in reader:
+        if not any(row):
+            continue
+        name = cell(row, name_at) or ' '.join(filter(None, (cell(row, first_at), cell(row, last_at))))
+        yield reader.line_num, {'email': cell(row, email_at), 'name': name}
+
+
+def read_ndjson(text):
+    """Yield (line number, object) from one JSON object per line"""
+    for line_no, line in enumerate(text, 1):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError:
+            item = None
+        yield line_no, item if isinstance(item, dict) else {}
+
+
+def import_subscribers(rows, source='import', reactivate=True, batch_size=IMPORT_BATCH):
+    """
+    Insert new subscribers and reactivate unsubscribed ones from
+    (line number, {"email", "name"}) rows, committing every batch.
+    Returns counts of inserted, reactivated and skipped rows with the
+    reasons rows were skipped and the first MAX_IMPORT_ERRORS errors.
+    """
+    from models import db
+
+    summary = {
+        'rows': 0, 'inserted': 0, 'reactivated': 0, 'skipped': 0,
+        'skipped_reasons': {'already_active': 0, 'unsubscribed': 0, 'duplicate': 0, 'invalid': 0},
+        'errors': []
+    }
+    seen = set()
+    batch = {}
+
+    def skip(reason, line_no=None, error=None):
+        summary['skipped'] += 1
+        summary['skipped_reasons'][reason] += 1
+        if error and len(summary['errors']) < MAX_IMPORT_ERRORS:
+            summary['errors'].append({'line': line_no, 'error': error})
+
+    for line_no, item in rows:
+        summary['rows'] += 1
+        email = normalize_email(item.get('email'))
+        if email is None:
+            skip('invalid', line_no, 'valid email required')
+            continue
+        if email in seen:
+            skip('duplicate')
+            continue
+        seen.add(email)
+        name = item.get('name')
+        batch[email] = name.strip()[:100] or None if isinstance(name, str) else None
+        if len(batch) >= batch_size:
+            _write_batch(batch, source, reactivate, summary, skip)
+            batch = {}
+    if batch:
+        _write_batch(batch, source, reactivate, summary, skip)
+    db.session.remove()
+    return summary
+
+
+def _write_batch(batch, source, reactivate, summary, skip):
+    from models import db
+
+    try:
+        counts = _apply_batch(batch, source, reactivate)
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent signup inserted one of the emails; look them up again
+        db.session.rollback()
+        counts = _apply_batch(batch, source, reactivate)
+        db.session.commit()
+    inserted, reactivated, active, unsubscribed = counts
+    summary['inserted'] += inserted
+    summary['reactivated'] += reactivated
+    for _ in range(active):
+        skip('already_active')
+    for _ in range(unsubscribed):
+        skip('unsubscribed')
+
+
+def _apply_batch(batch, source, reactivate):
+    """(inserted, reactivated, already active, left unsubscribed) for one batch"""
+    from models import db, NewsletterSubscriber
+
+    table = NewsletterSubscriber.__table__
+    existing = dict(db.session.execute(
+        select(table.c.email, table.c.status).where(table.c.email.in_(list(batch)))
+    ).all())
+
+    now = datetime.utcnow()
+    new = [
+        {'email': email, 'name': name, 'status': 'active', 'source': source,
+         'subscribed_at': now, 'updated_at': now}
+        for email, name in batch.items() if email not in existing
+    ]
+    inactive = [email for email, status in existing.items() if status != 'active']
+    active = len(existing) - len(inactive)
+
+    if new:
+        db.session.execute(insert(table), new)
+    if inactive and reactivate:
+        db.session.execute(
+            update(table)
+            .where(table.c.email.in_(inactive), table.c.status != 'active')
+            .values(status='active', unsubscribed_at=None, updated_at=now)
+        )
+        return len(new), len(inactive), active, 0
+    return len(new), 0, active, len(inactive)
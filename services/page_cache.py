@@ -0,0 +1,142 @@
+"""
+Page Cache - Pre-rendered, pre-compressed full pages for static routes
+
+Marketing pages do not depend on the database or on the request beyond
+the host and path, so each one is rendered once per worker and kept as
+identity, gzip and brotli byte variants with strong ETags. Responses are
+negotiated on Accept-Encoding and answered with 304 when the client
+already has the current version.
+"""
+
+import gzip
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from flask import request, render_template, current_app, Response
+from services.html_minify import html_minifier
+
+try:
+    import brotli
+except ImportError:  # brotli is installed with flask-compress
+    brotli = None
+
+
+class CachedPage:
+    """One rendered page and its encoded variants"""
+
+    def __init__(self, html, mtime):
+        self.mtime = mtime
+        body = html.encode('utf-8')
+        digest = hashlib.sha1(body).hexdigest()[:20]
+        self.variants = {None: (body, digest)}
+        self.variants['gzip'] = (gzip.compress(body, compresslevel=9, mtime=0), f'{digest}-gz')
+        if brotli is not None:
+            self.variants['br'] = (brotli.compress(body, quality=11), f'{digest}-br')
+
+    @property
+    def etags(self):
+        return [etag for _, etag in self.variants.values()]
+
+
+class PageCache:
+    """Per-worker cache of fully rendered template pages"""
+
+    def __init__(self, app=None):
+        self.enabled = True
+        self.max_entries = 256
+        self.check_interval = None
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+        self._template_mtime = 0.0
+        self._checked_at = 0.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('PAGE_CACHE_ENABLED', True)
+        self.max_entries = app.config.get('PAGE_CACHE_MAX_ENTRIES', 256)
+        # Templates only change on deploy in production, which restarts the
+        # workers. In debug mode check the template and static folders for
+        # edits (pages embed content-hashed asset URLs).
+        self.check_interval = 1.0 if app.debug or app.config.get('TEMPLATES_AUTO_RELOAD') else None
+        app.extensions['page_cache'] = self
+
+    def render(self, template_name, **context):
+        """Serve a template from the cache, rendering it on first use"""
+        if not self.enabled:
+            return render_template(template_name, **context)
+
+        key = (template_name, request.host.lower(), request.path)
+        mtime = self._current_mtime()
+        with self._lock:
+            page = self._pages.get(key)
+            if page is not None:
+                self._pages.move_to_end(key)
+
+        if page is None or page.mtime != mtime:
+            html = html_minifier.minify(render_template(template_name, **context))
+            page = CachedPage(html, mtime)
+            with self._lock:
+                self._pages[key] = page
+                while len(self._pages) > self.max_entries:
+                    self._pages.popitem(last=False)
+
+        return self._respond(page)
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+
+    def _respond(self, page):
+        encoding = choose_encoding(page.variants)
+        body, etag = page.variants[encoding]
+
+        if any(request.if_none_match.contains(tag) for tag in page.etags):
+            response = Response(status=304)
+        else:
+            response = Response(body, mimetype='text/html')
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+        response.set_etag(etag)
+        response.headers['Vary'] = 'Accept-Encoding'
+        return response
+
+    def _current_mtime(self):
+        if self.check_interval is None:
+            return self._template_mtime
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_interval:
+            self._checked_at = now
+            self._template_mtime = max(
+                _tree_mtime(os.path.join(current_app.root_path, current_app.template_folder)),
+                _tree_mtime(current_app.static_folder)
+            )
+        return self._template_mtime
+
+
+def choose_encoding(variants):
+    """Pick the best available encoding from the request's Accept-Encoding"""
+    accepted = request.accept_encodings
+    best, best_q = None, 0
+    for encoding in ('br', 'gzip'):
+        if encoding in variants:
+            q = accepted[encoding]
+            if q > best_q:
+                best, best_q = encoding, q
+    return best
+
+
+def _tree_mtime(path):
+    latest = 0.0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                latest = max(latest, os.path.getmtime(os.path.join(root, name)))
+            except OSError:
+                pass
+    return latest
+
+
+page_cache = PageCache()
@@ -0,0 +1,127 @@
+"""
+Keyset Pagination - Cursor-based paging on (timestamp, id)
+
+Instead of OFFSET/LIMIT plus COUNT, each page continues from the last row
+of the previous one, so deep pages cost the same as the first. Cursors
+are opaque URL-safe tokens; totals are optional and cached per worker.
+"""
+
+import base64
+import json
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(sort_value, row_id, page=None):
+    """Opaque cursor for a (timestamp, id) position"""
+    payload = [sort_value.isoformat() if sort_value else None, row_id]
+    if page is not None:
+        payload.append(page)
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """Return (timestamp, id, page) from a cursor; raises ValueError if invalid"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+        sort_value = datetime.fromisoformat(payload[0]) if payload[0] else None
+        row_id = int(payload[1])
+        page = int(payload[2]) if len(payload) > 2 else None
+    except (ValueError, TypeError, IndexError, KeyError):
+        raise ValueError('Invalid cursor')
+    return sort_value, row_id, page
+
+
+class KeysetPage:
+    """One page of results plus the cursors around it"""
+
+    def __init__(self, items, per_page, sort_attr, has_prev, has_next, page=None, total=None):
+        self.items = items
+        self.per_page = per_page
+        self.has_prev = has_prev
+        self.has_next = has_next
+        self.page = page
+        self.total = total
+        self._sort_attr = sort_attr
+
+    @property
+    def pages(self):
+        if self.total is None:
+            return None
+        return max(1, -(-self.total // self.per_page))
+
+    def _cursor(self, item, page):
+        return encode_cursor(getattr(item, self._sort_attr), item.id, page)
+
+    @property
+    def next_cursor(self):
+        if not self.has_next or not self.items:
+            return None
+        return self._cursor(self.items[-1], self.page + 1 if self.page else None)
+
+    @property
+    def prev_cursor(self):
+        if not self.has_prev or not self.items:
+            return None
+        return self._cursor(self.items[0], self.page - 1 if self.page else None)
+
+
+def keyset_paginate(query, sort_column, id_column, per_page, after=None, before=None, offset=None, page=None):
+    """
+    Page through query newest first on (sort_column, id_column).
+
+    after/before are cursors from a previous page. offset is only used for
+    legacy ?page=/offset= requests. page, when given, is carried in the
+    cursors so listings can still show a page number.
+    Raises ValueError for a malformed cursor.
+    """
+    sort_attr = sort_column.key
+
+    if before:
+        sort_value, row_id, cursor_page = decode_cursor(before)
+        rows = (
+            query.filter(or_(sort_column > sort_value, and_(sort_column == sort_value, id_column > row_id)))
+            .order_by(sort_column.asc(), id_column.asc())
+            .limit(per_page + 1)
+            .all()
+        )
+        has_prev = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        return KeysetPage(items, per_page, sort_attr, has_prev, True, page=cursor_page or page)
+
+    cursor_page = None
+    if after:
+        sort_value, row_id, cursor_page = decode_cursor(after)
+        query = query.filter(or_(sort_column < sort_value, and_(sort_column == sort_value, id_column < row_id)))
+
+    query = query.order_by(sort_column.desc(), id_column.desc())
+    if offset:
+        query = query.offset(offset)
+    rows = query.limit(per_page + 1).all()
+
+    has_prev = bool(after) or bool(offset)
+    return KeysetPage(rows[:per_page], per_page, sort_attr, has_prev, len(rows) > per_page,
+                      page=cursor_page or page)
+
+
+_counts = {}
+_counts_lock = threading.Lock()
+
+
+def cached_count(query, key, ttl=60):
+    """COUNT(*) for query, cached per worker for ttl seconds under key"""
+    now = time.monotonic()
+    with _counts_lock:
+        entry = _counts.get(key)
+    if entry is not None and entry[0] > now:
+        return entry[1]
+    count = query.order_by(None).count()
+    with _counts_lock:
+        if len(_counts) >= 1024:
+            _counts.clear()
+        _counts[key] = (now + ttl, count)
+    return count
@@ -0,0 +1,224 @@
+"""
+Post Links - Precomputed previous/next and related posts
+
+Each published post stores the links its page shows in BlogPost.links:
+
+    {"prev": {"slug", "title"} | null, "next": ... ,
+     "related": [{"slug", "title", "category", "featured_image", "read_time"}]}
+
+so rendering a post needs only the post row. Writes compare the post's
+link_state() before and after: only a change to a post that is or was
+published, in a field other posts' links show, triggers a refresh, and
+that refresh only compares and rewrites the posts whose links it can
+touch (old and new neighbours, and posts in the same categories).
+A scoped refresh reads the ordered ids of the published posts and the
+card fields of just those posts; a full one reads the card fields of
+every published post. Either way only rows whose links changed are
+rewritten. The
+writes preserve updated_at, so a neighbour's sitemap lastmod does not
+move.
+"""
+
+from sqlalchemy import bindparam, select, update
+
+RELATED_COUNT = 3
+# Post fields that appear in, or decide, other posts' links
+LINK_FIELDS = ('status', 'published_at', 'title', 'slug', 'category', 'featured_image', 'read_time')
+CARD_COLUMNS = ('id', 'slug', 'title', 'category', 'featured_image', 'read_time')
+
+
+def _card(row):
+    return {
+        'slug': row.slug,
+        'title': row.title,
+        'category': row.category,
+        'featured_image': row.featured_image,
+        'read_time': row.read_time,
+    }
+
+
+def _links(prev_row, next_row, related):
+    return {
+        'prev': {'slug': prev_row.slug, 'title': prev_row.title} if prev_row else None,
+        'next': {'slug': next_row.slug, 'title': next_row.title} if next_row else None,
+        'related': related,
+    }
+
+
+def compute_links(rows):
+    """{post_id: links} for published rows ordered oldest first"""
+    newest_by_category = {}
+    for row in reversed(rows):
+        newest = newest_by_category.setdefault(row.category, [])
+        if len(newest) <= RELATED_COUNT:
+            newest.append(row)
+
+    links = {}
+    for i, row in enumerate(rows):
+        prev_row = rows[i - 1] if i > 0 else None
+        next_row = rows[i + 1] if i + 1 < len(rows) else None
+        related = [r for r in newest_by_category[row.category] if r.id != row.id][:RELATED_COUNT]
+        links[row.id] = _links(prev_row, next_row, [_card(r) for r in related])
+    return links
+
+
+def link_state(post):
+    """What other posts' links depend on in post, plus its id and own links"""
+    state = {field: getattr(post, field) for field in LINK_FIELDS}
+    state.update(id=post.id, links=post.links)
+    return state
+
+
+def links_affected(before, after):
+    """
+    Whether a change from before to after (link_state() dicts, None for
+    a post that did not or no longer exists) can change stored links
+    """
+    if not any(state and state['status'] == 'published' for state in (before, after)):
+        return False
+    if before is None or after is None:
+        return True
+    return any(before[field] != after[field] for field in LINK_FIELDS)
+
+
+def _scoped_links(session, table, changes):
+    """
+    ({post_id: links}, {post_id: stored links}) for the posts the
+    (before, after) changes can touch: the changed posts, their old and
+    new neighbours (prev/next), and the published posts in their old and
+    new categories (related). A neighbour in another category keeps its
+    stored related posts.
+    """
+    published = table.c.status == 'published'
+    order = session.execute(
+        select(table.c.id).where(published).order_by(table.c.published_at, table.c.id)
+    ).scalars().all()
+    position = {post_id: i for i, post_id in enumerate(order)}
+
+    changed, categories, neighbour_slugs = set(), set(), set()
+    for before, after in changes:
+        for state in filter(None, (before, after)):
+            changed.add(state['id'])
+            categories.add(state['category'])
+        # Old neighbours are now next to each other
+        for side in ('prev', 'next'):
+            link = ((before or {}).get('links') or {}).get(side)
+            if link:
+                neighbour_slugs.add(link['slug'])
+    seeds = changed | set(session.execute(
+        select(table.c.id).where(table.c.slug.in_(neighbour_slugs))
+    ).scalars())
+
+    def around(ids):
+        found = set()
+        for post_id in ids:
+            i = position.get(post_id)
+            if i is not None:
+                found.update(order[max(0, i - 1):i + 2])
+        return found
+
+    near = around(seeds)
+    columns = [table.c[name] for name in CARD_COLUMNS] + [table.c.links]
+    rows = session.execute(select(*columns).where(table.c.id.in_(around(near) | changed))).all()
+    rows += session.execute(select(*columns).where(published, table.c.category.in_(categories))).all()
+    by_id = {row.id: row for row in rows}
+    stored = {post_id: by_id[post_id].links for post_id in near | changed if post_id in by_id}
+
+    newest_by_category = {}
+    for row in sorted(
+        (row for row in by_id.values() if row.id in position and row.category in categories),
+        key=lambda row: position[row.id], reverse=True
+    ):
+        newest = newest_by_category.setdefault(row.category, [])
+        if len(newest) <= RELATED_COUNT:
+            newest.append(row)
+
+    wanted = {}
+    for post_id in set(stored) | {row.id for row in rows if row.category in categories}:
+        i = position.get(post_id)
+        if i is None:
+            wanted[post_id] = None
+            continue
+        row = by_id[post_id]
+        stored[post_id] = row.links
+        current = row.links or {}
+        if row.category in categories:
+            related = [_card(r) for r in newest_by_category[row.category] if r.id != row.id][:RELATED_COUNT]
+        else:
+            related = current.get('related', [])
+        if post_id in near:
+            wanted[post_id] = _links(
+                by_id[order[i - 1]] if i > 0 else None,
+                by_id[order[i + 1]] if i + 1 < len(order) else None,
+                related
+            )
+        else:
+            # Not next to a change: only its related posts can differ
+            wanted[post_id] = dict(current, related=related)
+    return wanted, stored
+
+
+def refresh_post_links(session=None, changes=None):
+    """
+    Recompute stored links; returns the number of rows written. With
+    changes, a list of (before, after) link_state() pairs, only the
+    posts they can affect are read and rewritten; without, every post
+    is. Runs on the given session or connection (db.session by
+    default); the caller commits.
+    """
+    from models import db, BlogPost
+
+    session = session or db.session
+    if session is db.session:
+        db.session.flush()
+
+    table = BlogPost.__table__
+    if changes is None:
+        rows = session.execute(
+            select(*[table.c[name] for name in CARD_COLUMNS])
+            .where(table.c.status == 'published')
+            .order_by(table.c.published_at, table.c.id)
+        ).all()
+        wanted = compute_links(rows)
+        stored = dict(session.execute(select(table.c.id, table.c.links)).all())
+    else:
+        wanted, stored = _scoped_links(session, table, changes)
+
+    updates = [
+        {'post_id': post_id, 'new_links': wanted.get(post_id)}
+        for post_id, links in stored.items()
+        if links != wanted.get(post_id)
+    ]
+    if updates:
+        session.execute(
+            update(table)
+            .where(table.c.id == bindparam('post_id'))
+            .values(links=bindparam('new_links'), updated_at=table.c.updated_at),
+            updates
+        )
+    return len(updates)
+
+
+def live_links(post):
+    """Links queried on the fly, for posts without stored links (previews)"""
+    from models import BlogPost
+
+    published = BlogPost.query.filter(BlogPost.status == 'published', BlogPost.id != post.id)
+    related = published.filter(BlogPost.category == post.category).order_by(
+        BlogPost.published_at.desc()
+    ).limit(RELATED_COUNT).all()
+
+    prev_post = next_post = None
+    if post.published_at:
+        prev_post = published.filter(BlogPost.published_at < post.published_at).order_by(
+            BlogPost.published_at.desc()
+        ).first()
+        next_post = published.filter(BlogPost.published_at > post.published_at).order_by(
+            BlogPost.published_at.asc()
+        ).first()
+
+    return {
+        'prev': {'slug': prev_post.slug, 'title': prev_post.title} if prev_post else None,
+        'next': {'slug': next_post.slug, 'title': next_post.title} if next_post else None,
+        'related': [_card(r) for r in related],
+    }
@@ -0,0 +1,179 @@
+"""
+Post Ingestion - Idempotent bulk upsert of blog posts
+
+Posts are matched on external_id (the id in the source system, e.g. an
+n8n workflow item), so a retried or re-sent batch updates the posts it
+created the first time instead of duplicating them. A batch is written in
+one transaction; invalid items are reported and skipped.
+"""
+
+from datetime import datetime, timezone
+
+# Fields a client may set on create or update
+POST_FIELDS = (
+    'title', 'content', 'excerpt', 'category', 'tags', 'featured_image',
+    'status', 'author', 'meta_title', 'meta_description', 'scheduled_for'
+)
+STATUSES = ('draft', 'published', 'scheduled')
+# external_id lookups per query
+LOOKUP_CHUNK = 500
+
+
+def default_excerpt(content):
+    """First 300 characters of the content without Markdown markers"""
+    content_text = content[:300].replace('#', '').replace('*', '').strip()
+    return content_text + '...' if len(content) > 300 else content_text
+
+
+def parse_datetime(value):
+    """Naive UTC datetime from an ISO 8601 timestamp (a trailing Z is accepted)"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _clean(item):
+    """Validate one item, returning the fields it sets; raises ValueError"""
+    if not isinstance(item, dict):
+        raise ValueError('each post must be an object')
+    external_id = item.get('external_id')
+    if not external_id or not isinstance(external_id, (str, int)):
+        raise ValueError('external_id is required')
+    fields = {field: item[field] for field in POST_FIELDS if field in item}
+    for field in ('title', 'content'):
+        if field in fields and not isinstance(fields[field], str):
+            raise ValueError(f'{field} must be a string')
+    if 'status' in fields and fields['status'] not in STATUSES:
+        raise ValueError(f"status must be one of {', '.join(STATUSES)}")
+    if 'tags' in fields and not isinstance(fields['tags'], list):
+        raise ValueError('tags must be a list')
+    if 'scheduled_for' in fields:
+        if fields['scheduled_for'] is not None and not isinstance(fields['scheduled_for'], str):
+            raise ValueError('scheduled_for must be an ISO 8601 string')
+        fields['scheduled_for'] = parse_datetime(fields['scheduled_for'])
+    return str(external_id)[:100], fields
+
+
+def _find_existing(external_ids):
+    from models import BlogPost
+
+    external_ids = sorted(set(external_ids))
+    found = {}
+    for start in range(0, len(external_ids), LOOKUP_CHUNK):
+        chunk = external_ids[start:start + LOOKUP_CHUNK]
+        for post in BlogPost.query.filter(BlogPost.external_id.in_(chunk)).order_by(BlogPost.id):
+            found.setdefault(post.external_id, post)
+    return found
+
+
+def _new_post(external_id, fields, slug, source):
+    from models import BlogPost
+
+    content = fields['content']
+    excerpt = fields.get('excerpt') or default_excerpt(content)
+    post = BlogPost(
+        title=fields['title'],
+        slug=slug,
+        content=content,
+        excerpt=excerpt,
+        category=fields.get('category') or 'digital-marketing',
+        tags=fields.get('tags') or [],
+        featured_image=fields.get('featured_image'),
+        status=fields.get('status') or 'draft',
+        author=fields.get('author') or 'DUODRIVEN Team',
+        meta_title=fields.get('meta_title') or fields['title'][:70],
+        meta_description=fields.get('meta_description') or excerpt[:160],
+        scheduled_for=fields.get('scheduled_for'),
+        source=source,
+        external_id=external_id
+    )
+    post.render_content()
+    if post.status == 'published':
+        post.published_at = datetime.utcnow()
+    return post
+
+
+def _update_post(post, fields):
+    """Apply changed fields; returns True if anything changed"""
+    changed = [field for field, value in fields.items() if getattr(post, field) != value]
+    for field in changed:
+        setattr(post, field, fields[field])
+    if 'content' in changed:
+        post.read_time = max(1, len(post.content.split()) // 200)
+    if 'content' in changed or post.needs_render:
+        post.render_content()
+    if post.status == 'published' and not post.published_at:
+        post.published_at = datetime.utcnow()
+    return bool(changed)
+
+
+def upsert_posts(items, source='api'):
+    """
+    Create or update posts by external_id in a single transaction.
+
+    Existing posts keep their slug (and URL) when their title changes.
+    Returns one result dict per item, in order; the caller handles
+    database errors (nothing is committed if one is raised).
+    """
+    from models import db
+    from services.post_links import link_state, links_affected, refresh_post_links
+    from services.slugs import allocate_slugs
+    from services.tags import sync_many_post_tags
+
+    results, cleaned = [], []
+    for index, item in enumerate(items):
+        try:
+            external_id, fields = _clean(item)
+        except ValueError as e:
+            results.append({'index': index, 'result': 'error', 'error': str(e)})
+            continue
+        results.append({'index': index, 'external_id': external_id})
+        cleaned.append((results[-1], external_id, fields))
+
+    posts = _find_existing(external_id for _, external_id, _ in cleaned)
+
+    # Validate new posts, then resolve all of their slugs at once
+    creates, pending = [], set()
+    for result, external_id, fields in cleaned:
+        if external_id in posts or external_id in pending:
+            continue
+        if not fields.get('title') or not fields.get('content'):
+            result.update(result='error', error='title and content are required for new posts')
+            continue
+        creates.append((result, external_id, fields))
+        pending.add(external_id)
+    slugs = dict(zip((e for _, e, _ in creates), allocate_slugs(f['title'] for _, _, f in creates)))
+
+    touched, before = [], {}
+    for result, external_id, fields in cleaned:
+        if result.get('result') == 'error':
+            continue
+        post = posts.get(external_id)
+        if post is None:
+            post = _new_post(external_id, fields, slugs[external_id], source)
+            db.session.add(post)
+            posts[external_id] = post
+            before[post] = None
+            result['result'] = 'created'
+        else:
+            before.setdefault(post, link_state(post))
+            result['result'] = 'updated' if _update_post(post, fields) else 'unchanged'
+        if post not in touched:
+            touched.append(post)
+        result['post'] = post
+
+    db.session.flush()
+    sync_many_post_tags(touched)
+    changes = [(state, link_state(post)) for post, state in before.items()]
+    changes = [change for change in changes if links_affected(*change)]
+    if changes:
+        refresh_post_links(changes=changes)
+
+    for result in results:
+        post = result.pop('post', None)
+        if post is not None:
+            result.update(id=post.id, slug=post.slug, url=f'/blog/{post.slug}', status=post.status)
+    return results
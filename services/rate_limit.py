@@ -0,0 +1,225 @@
+"""
+Rate Limit - Per-client token buckets and global concurrency caps
+
+The public POST endpoints are limited twice. Each client (IP address) has
+a token bucket per endpoint: a request takes a token, tokens refill at
+the policy's rate up to its burst size, and an empty bucket is answered
+429 with the seconds until the next token in Retry-After. Each endpoint
+also has a cap on requests in progress across all workers, answered 503
+when full, so a burst of slow chats cannot take every thread.
+
+The state lives in a small SQLite file (RATE_LIMIT_DB, see
+services.local_db) that every gunicorn worker opens, so the limits hold
+for the whole server rather than per process. Each check is one short
+write transaction. A slot is a lease row that is deleted when the
+response is closed; gunicorn.conf.py drops the leases of a worker that
+exits, and a lease older than RATE_LIMIT_LEASE_TTL is treated as
+abandoned. If the file cannot be written the request is let through
+rather than failed.
+"""
+
+import math
+import os
+import sqlite3
+import time
+from functools import wraps
+from flask import request, jsonify, make_response
+from services.local_db import LocalDB
+
+DEFAULT_DB = '/tmp/duodriven-ratelimit.db'
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+# Seconds between sweeps of buckets that have refilled completely
+PRUNE_INTERVAL = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    key TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL,
+    full_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_buckets_full_at ON buckets (full_at);
+CREATE TABLE IF NOT EXISTS leases (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    started REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_leases_name ON leases (name, started);
+"""
+
+
+def parse_rate(value):
+    """'20/minute' -> (20, 60); a falsy value or '0/...' means no limit"""
+    if not value:
+        return None
+    count, _, period = str(value).partition('/')
+    count = int(count)
+    if period not in PERIODS:
+        raise ValueError(f'rate limit period must be one of {", ".join(PERIODS)}: {value!r}')
+    return (count, PERIODS[period]) if count > 0 else None
+
+
+class Policy:
+    """Limits for one endpoint: burst tokens refilled over period, and a slot cap"""
+
+    def __init__(self, rate=None, concurrency=0):
+        limit = parse_rate(rate)
+        self.burst, period = limit or (0, 1)
+        self.refill = self.burst / period if limit else 0.0
+        self.concurrency = int(concurrency or 0)
+
+
+class RateLimited(Exception):
+    """Raised when a request is refused; status is 429 or 503"""
+
+    def __init__(self, status, retry_after):
+        super().__init__(status)
+        self.status = status
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class RateLimiter:
+    """Token buckets and concurrency leases shared by all workers through SQLite"""
+
+    def __init__(self, app=None):
+        self.enabled = True
+        self.proxy_count = 1
+        self.lease_ttl = 300
+        self.policies = {}
+        self._db = LocalDB(SCHEMA, DEFAULT_DB)
+        self._pruned_at = 0.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('RATE_LIMIT_ENABLED', True)
+        self._db.configure(app.config.get('RATE_LIMIT_DB') or DEFAULT_DB)
+        self.proxy_count = app.config.get('RATE_LIMIT_PROXY_COUNT', 1)
+        self.lease_ttl = app.config.get('RATE_LIMIT_LEASE_TTL', 300)
+        self.policies = {
+            name: Policy(app.config.get(f'RATE_LIMIT_{name.upper()}'),
+                         app.config.get(f'RATE_LIMIT_{name.upper()}_CONCURRENCY'))
+            for name in ('chat', 'contact', 'newsletter')
+        }
+        app.extensions['rate_limiter'] = self
+
+    # Limits
+
+    def admit(self, name, client, now=None):
+        """
+        Take a token from the client's bucket and reserve one of the
+        endpoint's slots in one transaction. Returns the lease to release,
+        or raises RateLimited: 429 for an empty bucket, 503 when every
+        slot is taken (the client is not charged a token).
+        """
+        policy = self.policies.get(name)
+        if policy is None or not (policy.burst or policy.concurrency):
+            return None
+        now = time.time() if now is None else now
+        key = f'{name}:{client}'
+
+        def work(conn):
+            if policy.burst:
+                row = conn.execute('SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+                tokens = policy.burst if row is None else min(
+                    policy.burst, row[0] + (now - row[1]) * policy.refill
+                )
+                if tokens < 1:
+                    raise RateLimited(429, (1 - tokens) / policy.refill)
+            if policy.concurrency:
+                conn.execute('DELETE FROM leases WHERE name = ? AND started < ?', (name, now - self.lease_ttl))
+                (in_use,) = conn.execute('SELECT count(*) FROM leases WHERE name = ?', (name,)).fetchone()
+                if in_use >= policy.concurrency:
+                    raise RateLimited(503, 5)
+            if policy.burst:
+                tokens -= 1
+                conn.execute(
+                    'INSERT INTO buckets (key, tokens, updated, full_at) VALUES (?, ?, ?, ?) '
+                    'ON CONFLICT (key) DO UPDATE SET tokens = excluded.tokens, '
+                    'updated = excluded.updated, full_at = excluded.full_at',
+                    (key, tokens, now, now + (policy.burst - tokens) / policy.refill)
+                )
+                if now - self._pruned_at > PRUNE_INTERVAL:
+                    # A full bucket behaves exactly like a missing one
+                    conn.execute('DELETE FROM buckets WHERE full_at < ?', (now,))
+                    self._pruned_at = now
+            if policy.concurrency:
+                return conn.execute(
+                    'INSERT INTO leases (name, pid, started) VALUES (?, ?, ?)', (name, os.getpid(), now)
+                ).lastrowid
+            return None
+
+        return self._db.transaction(work)
+
+    def release(self, lease):
+        if lease is None:
+            return
+        try:
+            self._db.transaction(lambda conn: conn.execute('DELETE FROM leases WHERE id = ?', (lease,)))
+        except sqlite3.Error as e:
+            # The lease expires after RATE_LIMIT_LEASE_TTL anyway
+            print(f"Could not release rate limit lease {lease}: {e}")
+
+    def client_id(self):
+        """Client address, taken from X-Forwarded-For behind RATE_LIMIT_PROXY_COUNT proxies"""
+        if self.proxy_count:
+            hops = [hop.strip() for hop in request.headers.get('X-Forwarded-For', '').split(',') if hop.strip()]
+            if len(hops) >= self.proxy_count:
+                return hops[-self.proxy_count]
+        return request.remote_addr or 'unknown'
+
+    def limit(self, name, message='Too many requests. Please try again in a moment.', **extra):
+        """
+        Decorate a view with the named policy. Refused requests get
+        {"success": false, "error": message, **extra} with Retry-After.
+        A streamed response keeps its slot until it is closed.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return view(*args, **kwargs)
+                try:
+                    lease = self.admit(name, self.client_id())
+                except RateLimited as e:
+                    body = {'success': False, 'error': message, **extra}
+                    return jsonify(body), e.status, {'Retry-After': str(e.retry_after)}
+                except sqlite3.Error as e:
+                    print(f"Rate limiter unavailable, allowing request: {e}")
+                    return view(*args, **kwargs)
+
+                try:
+                    response = make_response(view(*args, **kwargs))
+                except BaseException:
+                    self.release(lease)
+                    raise
+                if response.is_streamed:
+                    response.call_on_close(lambda: self.release(lease))
+                else:
+                    self.release(lease)
+                return response
+            return wrapper
+        return decorator
+
+
+def release_leases(pid=None, path=None):
+    """Drop an exited worker's leases, or every lease (gunicorn master hooks)"""
+    path = path or os.getenv('RATE_LIMIT_DB') or DEFAULT_DB
+    if not os.path.exists(path):
+        return
+    conn = sqlite3.connect(path, timeout=1.0)
+    try:
+        with conn:
+            if pid is None:
+                conn.execute('DELETE FROM leases')
+            else:
+                conn.execute('DELETE FROM leases WHERE pid = ?', (pid,))
+    except sqlite3.Error:
+        # No leases table yet, or the file is busy; leases expire anyway
+        pass
+    finally:
+        conn.close()
+
+
+rate_limiter = RateLimiter()
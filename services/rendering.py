@@ -0,0 +1,32 @@
+"""
+Markdown Rendering - Render-on-write HTML for blog posts
+"""
+
+import hashlib
+import json
+import markdown
+
+# Extensions used to render post content. Changing this list (or the
+# installed Markdown version) changes RENDER_VERSION, which marks every
+# stored rendering as stale.
+MD_EXTENSIONS = ['fenced_code', 'tables', 'toc', 'nl2br']
+MD_EXTENSION_CONFIGS = {}
+
+RENDER_VERSION = hashlib.sha1(json.dumps({
+    'markdown': markdown.__version__,
+    'extensions': MD_EXTENSIONS,
+    'configs': MD_EXTENSION_CONFIGS
+}, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def render_markdown(content):
+    """
+    Render Markdown to HTML.
+
+    Returns a (html, toc_html) tuple. toc_html is None when the content
+    has no headings.
+    """
+    md = markdown.Markdown(extensions=MD_EXTENSIONS, extension_configs=MD_EXTENSION_CONFIGS)
+    html = md.convert(content or '')
+    toc_html = md.toc if getattr(md, 'toc_tokens', None) else None
+    return html, toc_html
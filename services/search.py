@@ -0,0 +1,197 @@
+"""
+Blog Search - SQLite FTS5 full-text search over published posts
+
+post_search is an external-content FTS5 index over blog_posts (title,
+excerpt, content, tags). Triggers created by migration 4 keep it in sync
+with every insert, delete and edit of those columns, whatever code path
+writes the post. View-count updates do not touch it.
+
+Queries are built from the words the user typed; the last word is
+matched as a prefix so results (and title suggestions) update while
+typing. Matches are ranked with BM25, weighting title over tags over
+excerpt over content. The joins to blog_posts are CROSS JOINs so SQLite
+always drives them from the FTS match rather than from the status index.
+
+Other databases have no post_search table; there every word is matched
+with a LIKE over the same columns and results come newest first, without
+highlighting.
+"""
+
+import re
+from markupsafe import Markup, escape
+from sqlalchemy import DateTime, String, and_, cast, or_, text
+
+SEARCH_TABLE = 'post_search'
+
+# bm25() weights for title, excerpt, content, tags
+RANK_WEIGHTS = (10.0, 4.0, 1.0, 6.0)
+SNIPPET_TOKENS = 24
+MAX_TERMS = 8
+
+# Sentinels around highlighted terms, swapped for <mark> after escaping
+_OPEN, _CLOSE = '\x02', '\x03'
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+_MARKDOWN_RE = re.compile(r'[#*_`>|]+|!?\[([^\]]*)\]\([^)]*\)')
+
+CREATE_STATEMENTS = (
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        title, excerpt, content, tags,
+        content='blog_posts', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_ai AFTER INSERT ON blog_posts BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, title, excerpt, content, tags)
+        VALUES (new.id, new.title, new.excerpt, new.content, new.tags);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_ad AFTER DELETE ON blog_posts BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, title, excerpt, content, tags)
+        VALUES ('delete', old.id, old.title, old.excerpt, old.content, old.tags);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_au AFTER UPDATE OF title, excerpt, content, tags ON blog_posts BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, title, excerpt, content, tags)
+        VALUES ('delete', old.id, old.title, old.excerpt, old.content, old.tags);
+        INSERT INTO {SEARCH_TABLE}(rowid, title, excerpt, content, tags)
+        VALUES (new.id, new.title, new.excerpt, new.content, new.tags);
+    END""",
+)
+
+
+def create_search_index(conn):
+    """Create the FTS5 table and triggers (SQLite only) and index existing posts"""
+    if conn.dialect.name != 'sqlite':
+        return
+    for statement in CREATE_STATEMENTS:
+        conn.exec_driver_sql(statement)
+    rebuild_search_index(conn)
+
+
+def rebuild_search_index(conn):
+    """Re-index every post from blog_posts"""
+    conn.exec_driver_sql(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')")
+
+
+def build_query(q, prefix=True, column=None):
+    """
+    FTS5 MATCH expression for user input, or None if it has no words.
+    Every word must match; the last one also matches as a prefix.
+    """
+    words = _WORD_RE.findall(q or '')[:MAX_TERMS]
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    if prefix:
+        terms[-1] += '*'
+    expression = ' '.join(terms)
+    return f'{column} : ({expression})' if column else expression
+
+
+def _has_index():
+    from models import db
+    return db.session.get_bind().dialect.name == 'sqlite'
+
+
+def _like_filter(q, columns):
+    """Every word of q (up to MAX_TERMS) in one of columns, or None if it has no words"""
+    words = _WORD_RE.findall(q or '')[:MAX_TERMS]
+    if not words:
+        return None
+    patterns = ['%' + re.sub(r'([\\%_])', r'\\\1', word) + '%' for word in words]
+    return and_(*(or_(*(column.ilike(pattern, escape='\\') for column in columns)) for pattern in patterns))
+
+
+def _like_search(q, limit, offset):
+    from models import BlogPost
+
+    condition = _like_filter(q, [BlogPost.title, BlogPost.excerpt, BlogPost.content, cast(BlogPost.tags, String)])
+    if condition is None:
+        return [], 0
+    query = BlogPost.query.filter(BlogPost.status == 'published', condition)
+    total = query.count()
+    posts = query.order_by(BlogPost.published_at.desc(), BlogPost.id.desc()).limit(limit).offset(offset).all()
+    results = [{
+        'id': post.id, 'slug': post.slug, 'title': post.title, 'excerpt': post.excerpt,
+        'category': post.category, 'featured_image': post.featured_image,
+        'read_time': post.read_time, 'published_at': post.published_at, 'rank': None,
+        'title_html': _highlight(post.title), 'snippet_html': _highlight(post.excerpt),
+    } for post in posts]
+    return results, total
+
+
+def _highlight(value):
+    """Escape FTS output and turn the sentinels into <mark> tags"""
+    value = _MARKDOWN_RE.sub(lambda m: m.group(1) or ' ', value or '')
+    value = str(escape(value))
+    return Markup(value.replace(_OPEN, '<mark>').replace(_CLOSE, '</mark>'))
+
+
+def search_posts(q, limit=10, offset=0, prefix=True):
+    """
+    Ranked published posts matching q. Returns (results, total) where each
+    result is a dict with the post's card fields plus highlighted
+    title_html and snippet_html.
+    """
+    from models import db
+
+    if not _has_index():
+        return _like_search(q, limit, offset)
+    match = build_query(q, prefix=prefix)
+    if match is None:
+        return [], 0
+
+    weights = ', '.join(str(w) for w in RANK_WEIGHTS)
+    rows = db.session.execute(text(f"""
+        SELECT p.id, p.slug, p.title, p.excerpt, p.category, p.featured_image,
+               p.read_time, p.published_at,
+               highlight({SEARCH_TABLE}, 0, :open, :close) AS title_html,
+               snippet({SEARCH_TABLE}, -1, :open, :close, '…', :tokens) AS snippet_html,
+               bm25({SEARCH_TABLE}, {weights}) AS rank
+        FROM {SEARCH_TABLE}
+        CROSS JOIN blog_posts p ON p.id = {SEARCH_TABLE}.rowid
+        WHERE {SEARCH_TABLE} MATCH :match AND p.status = 'published'
+        ORDER BY rank
+        LIMIT :limit OFFSET :offset
+    """).columns(published_at=DateTime), {
+        'open': _OPEN, 'close': _CLOSE, 'tokens': SNIPPET_TOKENS,
+        'match': match, 'limit': limit, 'offset': offset
+    }).mappings().all()
+
+    total = db.session.execute(text(f"""
+        SELECT count(*) FROM {SEARCH_TABLE}
+        CROSS JOIN blog_posts p ON p.id = {SEARCH_TABLE}.rowid
+        WHERE {SEARCH_TABLE} MATCH :match AND p.status = 'published'
+    """), {'match': match}).scalar()
+
+    results = []
+    for row in rows:
+        result = dict(row)
+        result['title_html'] = _highlight(row['title_html'])
+        result['snippet_html'] = _highlight(row['snippet_html'])
+        results.append(result)
+    return results, total
+
+
+def suggest_titles(q, limit=8):
+    """Titles of published posts whose title matches q as you type"""
+    from models import db, BlogPost
+
+    if not _has_index():
+        condition = _like_filter(q, [BlogPost.title])
+        if condition is None:
+            return []
+        rows = db.session.query(BlogPost.slug, BlogPost.title).filter(
+            BlogPost.status == 'published', condition
+        ).order_by(BlogPost.published_at.desc()).limit(limit).all()
+        return [{'slug': slug, 'title': title} for slug, title in rows]
+
+    match = build_query(q, prefix=True, column='title')
+    if match is None:
+        return []
+    rows = db.session.execute(text(f"""
+        SELECT p.slug, p.title
+        FROM {SEARCH_TABLE}
+        CROSS JOIN blog_posts p ON p.id = {SEARCH_TABLE}.rowid
+        WHERE {SEARCH_TABLE} MATCH :match AND p.status = 'published'
+        ORDER BY bm25({SEARCH_TABLE})
+        LIMIT :limit
+    """), {'match': match, 'limit': limit}).all()
+    return [{'slug': slug, 'title': title} for slug, title in rows]
@@ -0,0 +1,132 @@
+"""
+Slugs - Unique URL slugs for blog posts
+
+The unique index on blog_posts.slug is the source of truth: a slug is
+claimed by flushing it inside a savepoint and the next candidate is tried
+if another post (or another worker) got there first. The savepoint sits
+inside the request's transaction (see models), so a later failure rolls
+the post back. Candidates are the title's slug, a few numbered variants,
+then random suffixes, so the number of attempts stays bounded however
+many posts share a title.
+
+Slugs a renamed post used to have are kept in slug_redirects and answered
+with a 301 straight to the post's current URL. They are never handed to
+another post.
+
+Slugs for a batch of titles (bulk ingestion) are resolved with a handful
+of queries: every existing slug that could collide with a candidate is
+fetched up front and suffixes are assigned in memory.
+"""
+
+import secrets
+from itertools import islice
+from slugify import slugify
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+
+SLUG_MAX_LENGTH = 200
+# -2, -3, ... variants tried before falling back to random suffixes
+NUMBERED_CANDIDATES = 3
+MAX_ATTEMPTS = 8
+# Candidates per query, keeping the OR chain well inside SQLite's limits
+QUERY_CHUNK = 100
+
+
+def base_slug(title):
+    """Slug for a title before any de-duplication suffix"""
+    return slugify(title or '')[:SLUG_MAX_LENGTH].strip('-') or 'post'
+
+
+def _candidates(base):
+    yield base
+    for n in range(2, 2 + NUMBERED_CANDIDATES):
+        yield f'{base}-{n}'
+    while True:
+        yield f'{base}-{secrets.token_hex(3)}'
+
+
+def claim_slug(post, title):
+    """
+    Give post a unique slug derived from title and flush it. New posts
+    should not be added to the session yet; this adds them. Raises
+    IntegrityError if every candidate was taken.
+    """
+    from models import db, SlugRedirect
+
+    # Flush other pending changes first so a failed attempt only rolls back the slug
+    db.session.flush()
+    for candidate in islice(_candidates(base_slug(title)), MAX_ATTEMPTS):
+        if post.id is not None and candidate == post.slug:
+            return candidate
+        with db.session.no_autoflush:
+            redirect = db.session.get(SlugRedirect, candidate)
+        if redirect is not None and redirect.post_id != post.id:
+            continue
+        try:
+            with db.session.begin_nested():
+                post.slug = candidate
+                db.session.add(post)
+                db.session.flush()
+        except IntegrityError:
+            continue
+        return candidate
+    raise IntegrityError('slug allocation', None, Exception(f'No free slug for {title!r}'))
+
+
+def rename_post(post, title):
+    """Move post to the slug for its new title, keeping the old URL as a redirect"""
+    from models import db, SlugRedirect
+
+    old_slug = post.slug
+    new_slug = claim_slug(post, title)
+    if new_slug != old_slug:
+        # Renamed back to a former slug: it is live again
+        SlugRedirect.query.filter_by(old_slug=new_slug).delete(synchronize_session=False)
+        db.session.add(SlugRedirect(old_slug=old_slug, post_id=post.id))
+    return new_slug
+
+
+def redirect_target(slug):
+    """Current slug of the post that used to live at slug, or None"""
+    from models import db, BlogPost, SlugRedirect
+
+    return db.session.query(BlogPost.slug).join(
+        SlugRedirect, SlugRedirect.post_id == BlogPost.id
+    ).filter(SlugRedirect.old_slug == slug).scalar()
+
+
+def existing_slugs(bases):
+    """Slugs in use or redirected that equal one of bases or extend it with a suffix"""
+    from models import db, BlogPost, SlugRedirect
+
+    bases = sorted(set(bases))
+    taken = set()
+    for start in range(0, len(bases), QUERY_CHUNK):
+        chunk = bases[start:start + QUERY_CHUNK]
+        for column in (BlogPost.slug, SlugRedirect.old_slug):
+            rows = db.session.query(column).filter(or_(
+                column.in_(chunk),
+                *[column.like(f'{base}-%') for base in chunk]
+            ))
+            taken.update(slug for (slug,) in rows)
+    return taken
+
+
+def allocate_slugs(titles):
+    """
+    Unique slugs for titles, distinct from each other and from stored
+    posts. A concurrent writer can still take one before the caller
+    flushes; the unique index then raises IntegrityError and the caller
+    retries the batch.
+    """
+    bases = [base_slug(title) for title in titles]
+    taken = existing_slugs(bases)
+    slugs = []
+    for base in bases:
+        slug, n = base, 2
+        while slug in taken:
+            slug = f'{base}-{n}'
+            n += 1
+        taken.add(slug)
+        slugs.append(slug)
+    return slugs
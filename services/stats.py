@@ -0,0 +1,70 @@
+"""
+Stats - Dashboard counts from one grouped query per table
+
+Counts are computed in a single GROUP BY status pass over each table and
+kept as a per-worker snapshot for STATS_MAX_AGE seconds, so dashboards
+polling /api/v1/stats cost at most three queries per worker per window.
+"""
+
+import threading
+import time
+from datetime import datetime
+from flask import current_app
+
+_snapshot = None  # (monotonic time, generated_at, stats)
+_lock = threading.Lock()
+
+
+def compute_stats():
+    """Fresh counts straight from the database"""
+    from models import db, BlogPost, NewsletterSubscriber, ContactSubmission
+
+    posts = {
+        status: (count, views or 0)
+        for status, count, views in db.session.query(
+            BlogPost.status, db.func.count(BlogPost.id), db.func.sum(BlogPost.views)
+        ).group_by(BlogPost.status)
+    }
+    subscribers = dict(
+        db.session.query(NewsletterSubscriber.status, db.func.count(NewsletterSubscriber.id))
+        .group_by(NewsletterSubscriber.status)
+    )
+    contacts = dict(
+        db.session.query(ContactSubmission.status, db.func.count(ContactSubmission.id))
+        .group_by(ContactSubmission.status)
+    )
+
+    return {
+        'blog': {
+            'total_posts': sum(count for count, _ in posts.values()),
+            'published': posts.get('published', (0, 0))[0],
+            'drafts': posts.get('draft', (0, 0))[0],
+            'scheduled': posts.get('scheduled', (0, 0))[0],
+            'total_views': sum(views for _, views in posts.values())
+        },
+        'newsletter': {
+            'total_subscribers': subscribers.get('active', 0)
+        },
+        'contacts': {
+            'total': sum(contacts.values()),
+            'new': contacts.get('new', 0)
+        }
+    }
+
+
+def get_stats(fresh=False):
+    """
+    Stats no older than STATS_MAX_AGE seconds (fresh=True recomputes).
+    Returns (stats, generated_at).
+    """
+    global _snapshot
+    max_age = current_app.config.get('STATS_MAX_AGE', 30)
+    now = time.monotonic()
+
+    with _lock:
+        snapshot = _snapshot
+    if fresh or snapshot is None or now - snapshot[0] > max_age:
+        snapshot = (now, datetime.utcnow(), compute_stats())
+        with _lock:
+            _snapshot = snapshot
+    return snapshot[2], snapshot[1]
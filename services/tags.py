@@ -0,0 +1,145 @@
+"""
+Tag Index - Normalized post/tag association and published tag counts
+
+BlogPost.tags stays the source of truth for API responses. The post_tags
+and tag_counts tables mirror it so tag filters and popular tags can be
+answered from indexes instead of scanning every post.
+"""
+
+from sqlalchemy import delete, func, insert, select
+
+
+def normalize_tags(tags):
+    """Return the distinct, non-empty tags of a post in their original order"""
+    seen = []
+    for tag in tags or []:
+        if isinstance(tag, str):
+            tag = tag.strip()[:100]
+            if tag and tag not in seen:
+                seen.append(tag)
+    return seen
+
+
+def sync_post_tags(post):
+    """
+    Mirror post.tags into post_tags and refresh the counts of every tag the
+    post had or has. Call after any change to a post's tags or status; the
+    caller commits.
+    """
+    sync_many_post_tags([post])
+
+
+def sync_many_post_tags(posts):
+    """sync_post_tags for several posts with one lookup and one recount"""
+    from models import db, PostTag
+
+    if not posts:
+        return
+    db.session.flush()
+    ids = [post.id for post in posts]
+    old = {}
+    for tag, post_id in db.session.query(PostTag.tag, PostTag.post_id).filter(PostTag.post_id.in_(ids)):
+        old.setdefault(post_id, set()).add(tag)
+
+    touched = set()
+    for post in posts:
+        had = old.get(post.id, set())
+        has = set(normalize_tags(post.tags))
+        removed = had - has
+        if removed:
+            PostTag.query.filter(PostTag.post_id == post.id, PostTag.tag.in_(removed)).delete(
+                synchronize_session=False
+            )
+        for tag in has - had:
+            db.session.add(PostTag(tag=tag, post_id=post.id))
+        touched |= had | has
+
+    db.session.flush()
+    refresh_tag_counts(touched)
+
+
+def remove_post_tags(post_id):
+    """Drop a post from the tag index (before it is deleted); the caller commits"""
+    from models import db, PostTag
+
+    tags = {t for (t,) in db.session.query(PostTag.tag).filter(PostTag.post_id == post_id)}
+    PostTag.query.filter(PostTag.post_id == post_id).delete(synchronize_session=False)
+    db.session.flush()
+    refresh_tag_counts(tags)
+
+
+def refresh_tag_counts(tags):
+    """Recount published posts for the given tags"""
+    from models import db, BlogPost, PostTag, TagCount
+
+    tags = set(tags)
+    if not tags:
+        return
+
+    counts = dict(
+        db.session.query(PostTag.tag, func.count(PostTag.post_id))
+        .join(BlogPost, BlogPost.id == PostTag.post_id)
+        .filter(PostTag.tag.in_(tags), BlogPost.status == 'published')
+        .group_by(PostTag.tag)
+        .all()
+    )
+
+    existing = {row.tag: row for row in TagCount.query.filter(TagCount.tag.in_(tags))}
+    for tag in tags:
+        count = counts.get(tag, 0)
+        row = existing.get(tag)
+        if count == 0:
+            if row is not None:
+                db.session.delete(row)
+        elif row is None:
+            db.session.add(TagCount(tag=tag, count=count))
+        else:
+            row.count = count
+
+
+def popular_tags(limit=10):
+    """Most used tags across published posts as (tag, count) pairs"""
+    from models import TagCount
+
+    rows = TagCount.query.order_by(TagCount.count.desc(), TagCount.tag).limit(limit).all()
+    return [(row.tag, row.count) for row in rows]
+
+
+def rebuild_tag_index(session=None, batch_size=500):
+    """
+    Rebuild post_tags and tag_counts from BlogPost.tags; returns the number
+    of published tags. Runs on the given session or connection (db.session
+    by default); the caller commits.
+    """
+    from models import db, BlogPost, PostTag, TagCount
+
+    session = session or db.session
+    posts = BlogPost.__table__
+    post_tags, tag_counts = PostTag.__table__, TagCount.__table__
+    session.execute(delete(post_tags))
+    session.execute(delete(tag_counts))
+
+    last_id = 0
+    while True:
+        batch = session.execute(
+            select(posts.c.id, posts.c.tags)
+            .where(posts.c.id > last_id)
+            .order_by(posts.c.id)
+            .limit(batch_size)
+        ).all()
+        if not batch:
+            break
+        rows = [{'tag': tag, 'post_id': post_id} for post_id, tags in batch for tag in normalize_tags(tags)]
+        if rows:
+            session.execute(insert(post_tags), rows)
+        last_id = batch[-1][0]
+
+    counts = session.execute(
+        select(post_tags.c.tag, func.count(post_tags.c.post_id))
+        .join(posts, posts.c.id == post_tags.c.post_id)
+        .where(posts.c.status == 'published')
+        .group_by(post_tags.c.tag)
+    ).all()
+    if counts:
+        session.execute(insert(tag_counts), [{'tag': tag, 'count': count} for tag, count in counts])
+    return len(counts)
@@ -0,0 +1,106 @@
+"""
+View Counter - Write-behind buffered blog post view counts
+
+Page views are accumulated in memory per worker and written in one batched
+UPDATE when the flush interval elapses, when the buffer reaches the flush
+threshold, or when the worker exits.
+"""
+
+import atexit
+import os
+import threading
+import time
+from sqlalchemy import text
+
+
+class ViewCounter:
+    """Per-process accumulator for BlogPost.views"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.flush_interval = 10
+        self.flush_threshold = 200
+        self._pending = {}
+        self._pending_total = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.flush_interval = app.config.get('VIEW_FLUSH_INTERVAL', 10)
+        self.flush_threshold = app.config.get('VIEW_FLUSH_THRESHOLD', 200)
+        app.extensions['view_counter'] = self
+        atexit.register(self.flush)
+
+    def record(self, post_id):
+        """Count one view of a post"""
+        with self._lock:
+            self._pending[post_id] = self._pending.get(post_id, 0) + 1
+            self._pending_total += 1
+            full = self._pending_total >= self.flush_threshold
+        if self.flush_threshold <= 1:
+            self.flush()
+            return
+        self._ensure_flusher()
+        if full:
+            self._wakeup.set()
+
+    def pending(self, post_id=None):
+        """Views recorded by this worker that are not yet in the database"""
+        with self._lock:
+            if post_id is None:
+                return self._pending_total
+            return self._pending.get(post_id, 0)
+
+    def flush(self):
+        """Write buffered views to the database in a single batched UPDATE"""
+        with self._lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, {}
+            self._pending_total = 0
+
+        from models import db
+        params = [{'id': post_id, 'n': count} for post_id, count in batch.items()]
+        try:
+            with self.app.app_context():
+                with db.engine.begin() as conn:
+                    conn.execute(
+                        text('UPDATE blog_posts SET views = COALESCE(views, 0) + :n WHERE id = :id'),
+                        params
+                    )
+        except Exception as e:
+            # Keep the counts for the next attempt
+            with self._lock:
+                for post_id, count in batch.items():
+                    self._pending[post_id] = self._pending.get(post_id, 0) + count
+                    self._pending_total += count
+            print(f"View counter flush failed: {e}")
+            return 0
+        return sum(batch.values())
+
+    def _ensure_flusher(self):
+        # Started lazily so each forked worker gets its own thread
+        if self._pid == os.getpid() and self._thread is not None:
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None:
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='view-counter', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        last_flush = time.monotonic()
+        while True:
+            self._wakeup.wait(max(0.0, self.flush_interval - (time.monotonic() - last_flush)))
+            self._wakeup.clear()
+            self.flush()
+            last_flush = time.monotonic()
+
+
+view_counter = ViewCounter()
@@ -0,0 +1,39 @@
+/**
+ * DUODRIVEN Blog Search
+ * Title suggestions for the search box while typing
+ */
+
+(function () {
+    const input = document.querySelector('.blog-search-form input[type="search"]');
+    const list = document.getElementById('blogSearchSuggestions');
+    if (!input || !list) return;
+
+    let timer = null;
+    let controller = null;
+
+    input.addEventListener('input', function () {
+        clearTimeout(timer);
+        const q = input.value.trim();
+        if (q.length < 2) {
+            list.innerHTML = '';
+            return;
+        }
+        timer = setTimeout(async function () {
+            if (controller) controller.abort();
+            controller = new AbortController();
+            try {
+                const url = input.dataset.suggestUrl + '?suggest=1&limit=8&q=' + encodeURIComponent(q);
+                const response = await fetch(url, { signal: controller.signal });
+                const data = await response.json();
+                list.innerHTML = '';
+                (data.suggestions || []).forEach(function (s) {
+                    const option = document.createElement('option');
+                    option.value = s.title;
+                    list.appendChild(option);
+                });
+            } catch (e) {
+                // Aborted by a newer keystroke or offline; keep the old list
+            }
+        }, 150);
+    });
+})();
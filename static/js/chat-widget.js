@@ -260,6 +260,7 @@ class ChatWidget {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
+                    'Accept': 'application/x-ndjson, application/json;q=0.9'
                 },
                 body: JSON.stringify({
                     message: message,
@@ -270,6 +271,12 @@ class ChatWidget {
                 })
             });
             
+            const contentType = response.headers.get('Content-Type') || '';
+            if (contentType.includes('application/x-ndjson') && response.body) {
+                await this.readStream(response);
+                return;
+            }
+            
             const data = await response.json();
             
             // Remove typing indicator
@@ -288,6 +295,58 @@ class ChatWidget {
         }
     }
     
+    async readStream(response) {
+        // Reply arrives as NDJSON: {"type": "delta", "content": "..."} lines,
+        // then {"type": "done"} (or {"type": "error", "reply": "..."})
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let reply = '';
+        let content = null;
+        
+        const render = (text) => {
+            if (!content) {
+                this.removeTypingIndicator();
+                this.appendMessage(text, 'bot', null, false);
+                content = this.messages.lastElementChild.querySelector('.message-content');
+            } else {
+                content.innerHTML = this.formatMessage(text);
+            }
+            this.scrollToBottom();
+        };
+        
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            
+            buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split('\n');
+            buffer = lines.pop();
+            
+            for (const line of lines) {
+                if (!line.trim()) continue;
+                const event = JSON.parse(line);
+                if (event.type === 'delta') {
+                    reply += event.content;
+                    render(reply);
+                } else if (event.type === 'error' && !reply) {
+                    reply = event.reply;
+                    render(reply);
+                }
+            }
+        }
+        
+        if (!reply) {
+            reply = "I'm sorry, I couldn't process that request. Please try again or email us at hello@duodriven.com";
+            render(reply);
+        }
+        
+        // Save the complete reply to history
+        const time = this.formatTime(new Date());
+        this.chatHistory.push({ content: reply, type: 'bot', time });
+        this.saveChatHistory();
+    }
+    
     clearHistory() {
         this.chatHistory = [];
         localStorage.removeItem('duodriven_chat_history');
@@ -1,13 +1,60 @@
 """
 WSGI entry point for production deployment
+
+gunicorn.conf.py preloads this module, so the app is built once in the
+gunicorn master and forked into the workers. Everything the workers would
+otherwise each redo on their first requests is done here first, then the
+heap is frozen so the garbage collector does not write to (and un-share)
+the pages the workers inherited.
 """
+import gc
+import importlib
 import os
 from dotenv import load_dotenv
 from app import create_app
 
 load_dotenv()
 
+# Imported on first use by the request path; loaded here so workers share them
+PRELOAD_MODULES = (
+    'requests',
+    'requests.adapters',
+    'markdown',
+    'services.rendering',
+    'services.search',
+    'services.pagination',
+    'services.post_links',
+    'services.stats',
+    'services.tags',
+    'services.slugs',
+    'services.posts',
+)
+
+
+def prepare_for_fork(app):
+    """Warm shared state in the master and leave nothing per-process behind"""
+    for name in PRELOAD_MODULES:
+        importlib.import_module(name)
+
+    # Compile every template now instead of once per worker on first render
+    env = app.jinja_env
+    templates = env.list_templates(filter_func=lambda name: name.endswith(('.html', '.xml')))
+    if env.cache is not None and env.cache.capacity < len(templates):
+        env.cache.capacity = len(templates)
+    for name in templates:
+        env.get_template(name)
+
+    # Workers must open their own database connections
+    from models import db
+    with app.app_context():
+        db.engine.dispose()
+
+    gc.collect()
+    gc.freeze()
+
+
 app = create_app(os.getenv('FLASK_ENV', 'production'))
+prepare_for_fork(app)
 
 if __name__ == "__main__":
     app.run()